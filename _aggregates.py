@@ -0,0 +1,120 @@
+"""
+Windowed aggregation of SUAVPy
+"""
+
+import csv
+import os
+import zipfile
+import numpy as np
+
+
+AGGREGATE_COLUMNS = ['Window', 'Start', 'End', 'UAV_ID', 'Steps', 'Detections', 'Mean_Vehicles', 'Mean_Speed', 'Speed_Var']
+
+
+class WindowAggregator:
+    """
+    Running statistics of the detections, written once per time window instead of one row per vehicle and step.
+
+    All state lives in fixed-size arrays (one entry per UAV and one heatmap over the network), so memory and the
+    size of the outputs depend on the number of windows, not on the traffic. Per window and UAV the steps with a
+    state row, the detections, the vehicles per step and the mean and variance of the detected speeds go to
+    '<name>_aggregates.csv'; the occupancy heatmap (vehicles seen by any UAV, counted once per step and cell) goes
+    to '<name>_heatmap.npz' with one 'heatmap/<window>' entry per window, plus 'bounds' and 'cell_size'.
+
+    Parameters:
+    output_file (str): Output file of the run, the aggregate files are named after it.
+    num_UAVs (int): Number of UAVs.
+    window_steps (int): Steps per window.
+    step_length (float): Simulation step length in seconds.
+    bounds (tuple): (min_x, min_y, max_x, max_y) of the heatmap, e.g. the network boundary.
+    cell_size (float): Heatmap cell size in metres.
+    """
+
+    def __init__(self, output_file, num_UAVs, window_steps, step_length, bounds, cell_size=50.0):
+        self.num_UAVs = num_UAVs
+        self.window_steps = max(int(window_steps), 1)
+        self.step_length = step_length
+        self.origin = np.array(bounds[:2], dtype=np.float64)
+        self.cell_size = cell_size
+        self.shape = (max(int(np.ceil((bounds[3] - bounds[1]) / cell_size)), 1),
+                      max(int(np.ceil((bounds[2] - bounds[0]) / cell_size)), 1)) # (rows along y, columns along x)
+
+        self.steps = np.zeros(num_UAVs, dtype=np.int64)
+        self.detections = np.zeros(num_UAVs, dtype=np.int64)
+        self.speed_sums = np.zeros(num_UAVs)
+        self.speed_squares = np.zeros(num_UAVs)
+        self.heatmap = np.zeros(self.shape[0] * self.shape[1], dtype=np.int64)
+        self.window = 0
+        self.window_start = 0 # last step of the previous window
+        self.last_step = 0
+
+        name = os.path.splitext(output_file)[0]
+        self.file = open(f"{name}_aggregates.csv", mode='w', newline='')
+        self.writer = csv.writer(self.file, delimiter=',')
+        self.writer.writerow(AGGREGATE_COLUMNS)
+        self.archive = zipfile.ZipFile(f"{name}_heatmap.npz", mode='w', compression=zipfile.ZIP_DEFLATED)
+
+    def add(self, step, reporting_ids, detecting_ids, vehicles_in_fovs, vehicle_grid):
+        # reporting_ids: UAVs with a state row this step, vehicles_in_fovs: vehicle indices per detecting UAV
+        if step > self.window_start + self.window_steps:
+            self.emit()
+            self.window_start = self.last_step
+        self.last_step = step
+        self.steps[reporting_ids] += 1
+
+        counts = np.array([len(in_view) for in_view in vehicles_in_fovs], dtype=np.int64)
+        if counts.sum() == 0:
+            return
+        vehicles = np.concatenate(vehicles_in_fovs)
+        uavs = np.repeat(np.asarray(detecting_ids, dtype=np.int64), counts)
+        speeds = vehicle_grid.speeds[vehicles]
+        self.detections += np.bincount(uavs, minlength=self.num_UAVs)
+        self.speed_sums += np.bincount(uavs, weights=speeds, minlength=self.num_UAVs)
+        self.speed_squares += np.bincount(uavs, weights=speeds * speeds, minlength=self.num_UAVs)
+
+        # a vehicle in several overlapping FOVs is counted once
+        cells = np.floor((vehicle_grid.positions[np.unique(vehicles)] - self.origin) / self.cell_size).astype(np.int64)
+        inside = (cells[:, 0] >= 0) & (cells[:, 0] < self.shape[1]) & (cells[:, 1] >= 0) & (cells[:, 1] < self.shape[0])
+        self.heatmap += np.bincount(cells[inside, 1] * self.shape[1] + cells[inside, 0], minlength=len(self.heatmap))
+
+    def emit(self):
+        # writes the statistics of the current window and starts the next one
+        steps = np.maximum(self.steps, 1)
+        detections = np.maximum(self.detections, 1)
+        means = np.where(self.detections > 0, self.speed_sums / detections, np.nan)
+        variances = np.where(self.detections > 0, np.maximum(self.speed_squares / detections - means * means, 0), np.nan)
+        start, end = self.window_start * self.step_length, self.last_step * self.step_length
+        self.writer.writerows(zip([self.window] * self.num_UAVs, [start] * self.num_UAVs, [end] * self.num_UAVs,
+                                  range(self.num_UAVs), self.steps.tolist(), self.detections.tolist(),
+                                  (self.detections / steps).tolist(), means.tolist(), variances.tolist()))
+        self.write_array(f"heatmap/{self.window:06d}.npy", self.heatmap.reshape(self.shape))
+
+        self.window += 1
+        for accumulator in (self.steps, self.detections, self.speed_sums, self.speed_squares, self.heatmap):
+            accumulator[:] = 0
+
+    def write_array(self, name, values):
+        with self.archive.open(name, mode='w', force_zip64=True) as entry:
+            np.lib.format.write_array(entry, np.asarray(values), allow_pickle=False)
+
+    def close(self):
+        if self.last_step > self.window_start:
+            self.emit()
+        self.write_array('bounds.npy', np.concatenate((self.origin, self.origin + self.cell_size * np.array(self.shape[::-1]))))
+        self.write_array('cell_size.npy', self.cell_size)
+        self.archive.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_heatmaps(heatmap_file):
+    # Loads a heatmap output as a (windows, rows, columns) array with its bounds and cell size
+    with np.load(heatmap_file, allow_pickle=False) as archive:
+        windows = sorted(key for key in archive.files if key.startswith('heatmap/'))
+        heatmaps = np.stack([archive[key] for key in windows]) if windows else np.empty((0, 0, 0), dtype=np.int64)
+        return heatmaps, archive['bounds'], float(archive['cell_size'])
@@ -0,0 +1,125 @@
+"""
+Battery model of SUAVPy
+"""
+
+import heapq
+import numpy as np
+
+WARNING = 'warning'
+DEPLETED = 'depleted'
+
+
+class ConstantDrain:
+    # Drain of one battery step per airborne simulation step, the model behind the battery life of the UAV presets.
+    # A drain model gets the pose of one UAV at consecutive steps and returns the drain of every step in battery
+    # steps, subclasses change the rate per step (e.g. with speed or altitude).
+
+    def drain(self, positions, step_length):
+        return (positions[:, 2] > 0).astype(np.float64)
+
+
+class SpeedDrain(ConstantDrain):
+    # hovering drains at the nominal rate, flying at `reference_speed` drains (1 + factor) times as fast
+
+    def __init__(self, reference_speed, factor=0.5):
+        self.reference_speed = reference_speed
+        self.factor = factor
+
+    def drain(self, positions, step_length):
+        speeds = np.linalg.norm(np.diff(positions, axis=0, prepend=positions[:1]), axis=1) / step_length
+        return super().drain(positions, step_length) * (1 + self.factor * speeds / self.reference_speed)
+
+
+class AltitudeDrain(ConstantDrain):
+    # every `reference_altitude` metres of height add `factor` times the nominal rate (climbing and wind)
+
+    def __init__(self, reference_altitude=100.0, factor=0.5):
+        self.reference_altitude = reference_altitude
+        self.factor = factor
+
+    def drain(self, positions, step_length):
+        return super().drain(positions, step_length) * (1 + self.factor * positions[:, 2] / self.reference_altitude)
+
+
+class BatteryMonitor:
+    """
+    Battery state of all UAVs as scheduled events instead of per-step counters.
+
+    The drain of every remaining step of a trajectory is known when the trajectory is published, so the steps at
+    which a UAV crosses the warning and the depletion level are computed once and pushed on a heap. The simulation
+    loop only pops the events that are due. When a path is updated mid-run the charge used so far is kept and the
+    events of that UAV are scheduled again from the current step, the old ones are dropped when they come up.
+
+    Parameters:
+    num_UAVs (int): Number of UAVs.
+    capacity (float): Battery life in battery steps (nominal simulation steps).
+    warning (float): Battery steps left when the warning is given.
+    step_length (float): Simulation step length in seconds.
+    drain_model (ConstantDrain): Drain per step, ConstantDrain if not given.
+    used (array-like): Battery steps already used at the start, per UAV.
+    """
+
+    def __init__(self, num_UAVs, capacity, warning, step_length, drain_model=None, used=0):
+        self.capacity = capacity
+        self.warning_level = capacity - warning
+        self.step_length = step_length
+        self.drain_model = drain_model or ConstantDrain()
+        self.used = np.zeros(num_UAVs) + used # used before the first scheduled step
+        self.schedule_start = np.ones(num_UAVs, dtype=np.int64)
+        self.cumulative = [np.zeros(0)] * num_UAVs # used at every step from schedule_start on
+        self.generation = np.zeros(num_UAVs, dtype=np.int64)
+        self.warned = np.zeros(num_UAVs, dtype=bool)
+        self.depleted = np.zeros(num_UAVs, dtype=bool)
+        self.events = [] # (step, generation, uav id, event)
+        self.snapshot = None
+
+    def advance(self, snapshot, step):
+        # events due at `step` as (uav id, WARNING or DEPLETED), rescheduling the UAVs whose path changed
+        if snapshot is not self.snapshot:
+            previous, self.snapshot = self.snapshot, snapshot
+            for uav_id, trajectory in enumerate(snapshot):
+                if previous is None or previous[uav_id] is not trajectory:
+                    self.schedule(uav_id, trajectory, step)
+
+        due = []
+        while self.events and self.events[0][0] <= step:
+            _, generation, uav_id, event = heapq.heappop(self.events)
+            if generation != self.generation[uav_id] or self.depleted[uav_id]:
+                continue # scheduled for a path that has been replaced
+            if event == WARNING:
+                self.warned[uav_id] = True
+            else:
+                self.depleted[uav_id] = True
+            due.append((uav_id, event))
+        return due
+
+    def used_before(self, uav_id, step):
+        # battery steps used up to and including step - 1
+        index = step - 1 - self.schedule_start[uav_id]
+        cumulative = self.cumulative[uav_id]
+        if index < 0 or len(cumulative) == 0:
+            return self.used[uav_id]
+        return cumulative[min(index, len(cumulative) - 1)]
+
+    def schedule(self, uav_id, trajectory, step):
+        # pushes the warning and depletion steps of the trajectory from `step` on
+        used = self.used_before(uav_id, step)
+        self.used[uav_id] = used
+        self.schedule_start[uav_id] = step
+        self.generation[uav_id] += 1
+
+        samples = trajectory.step_index[step:]
+        active = samples >= 0
+        positions = trajectory.positions[np.maximum(samples, 0)] if len(trajectory.positions) else np.zeros((len(samples), 3))
+        drain = np.where(active, self.drain_model.drain(positions, self.step_length), 0.0) if len(samples) else np.zeros(0)
+        self.cumulative[uav_id] = cumulative = used + np.cumsum(drain)
+
+        if self.depleted[uav_id]:
+            return
+        for level, event in ((self.warning_level, WARNING), (self.capacity, DEPLETED)):
+            if event == WARNING and self.warned[uav_id]:
+                continue
+            # first step that reaches the level, a level crossed between two steps fires at the later one
+            index = int(np.searchsorted(cumulative, level, side='left'))
+            if index < len(cumulative):
+                heapq.heappush(self.events, (step + index, int(self.generation[uav_id]), uav_id, event))
@@ -0,0 +1,51 @@
+"""
+Checkpoints of SUAVPy
+"""
+
+import os
+import pickle
+
+
+CHECKPOINT_FILE = 'checkpoint.pkl'
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(directory, backend, state):
+    """
+    Saves the SUMO state next to a pickled snapshot of the simulation state.
+
+    The SUMO state of every checkpoint gets its own file and the snapshot that names it replaces the previous one
+    with an atomic rename, so a run killed while saving still has the previous checkpoint complete.
+
+    Parameters:
+    directory (str): Checkpoint directory, created if missing.
+    backend: TraCI connection, libsumo or the stand-in with simulation.saveState.
+    state (dict): Simulation state, 'step' names the SUMO state file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    sumo_state = f"sumo_state_{state['step']}.xml"
+    backend.simulation.saveState(os.path.join(directory, sumo_state))
+
+    checkpoint_file = os.path.join(directory, CHECKPOINT_FILE)
+    with open(checkpoint_file + '.tmp', 'wb') as file:
+        pickle.dump(dict(state, sumo_state=sumo_state, version=CHECKPOINT_VERSION), file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(checkpoint_file + '.tmp', checkpoint_file)
+
+    for name in os.listdir(directory):
+        if name.startswith('sumo_state_') and name != sumo_state:
+            os.remove(os.path.join(directory, name))
+
+
+def load_checkpoint(directory):
+    # state of the last complete checkpoint, 'sumo_state' is the path of its SUMO state file
+    checkpoint_file = os.path.join(directory, CHECKPOINT_FILE)
+    if not os.path.exists(checkpoint_file):
+        raise FileNotFoundError(f"Checkpoint {checkpoint_file} not found.")
+    with open(checkpoint_file, 'rb') as file:
+        state = pickle.load(file)
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint {checkpoint_file} was written by another version")
+    state['sumo_state'] = os.path.join(directory, state['sumo_state'])
+    return state
@@ -0,0 +1,79 @@
+"""
+Simulation events of SUAVPy
+"""
+
+import logging
+import os
+import ujson as json
+
+
+BATTERY_WARNING = 'battery_warning'
+SIGNAL_LOST = 'signal_lost'
+
+logger = logging.getLogger('suavpy')
+
+
+class EventBus:
+    """
+    Warnings of the simulation loop (battery, signal loss) as events, handed to every subscribed sink.
+
+    An event is a dict with 'event', 'step', 'time', 'message' and the fields of the publisher (e.g. 'uav_id').
+    Sinks are callables taking the event; they run in the simulation thread, so a sink that needs another thread
+    (the Tkinter windows) queues the event there. Without sinks publishing costs a dict.
+    """
+
+    def __init__(self):
+        self.sinks = []
+
+    def subscribe(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def unsubscribe(self, sink):
+        self.sinks.remove(sink)
+
+    def publish(self, event, step, time, message, **fields):
+        record = {'event': event, 'step': step, 'time': time, **fields, 'message': message}
+        for sink in self.sinks:
+            sink(record)
+
+
+def log_sink(record):
+    logger.warning("t=%ss %s", record['time'], record['message'])
+
+
+class JsonEventSink:
+    """
+    Writes the events as JSON lines, flushed per event since they are rare and read while the run goes on.
+
+    Parameters:
+    event_file (str): Path of the .jsonl file.
+    resume_offset (int): Offset returned by checkpoint, the file is cut back to it and continued.
+    """
+
+    def __init__(self, event_file, resume_offset=None):
+        if os.path.dirname(event_file):
+            os.makedirs(os.path.dirname(event_file), exist_ok=True)
+        if resume_offset is None:
+            self.file = open(event_file, 'w')
+        else:
+            self.file = open(event_file, 'r+')
+            self.file.truncate(resume_offset)
+            self.file.seek(resume_offset)
+
+    def __call__(self, record):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def checkpoint(self):
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
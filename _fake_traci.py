@@ -0,0 +1,307 @@
+"""
+Offline TraCI stand-in of SUAVPy
+"""
+
+import sys
+import types
+import xml.etree.ElementTree as ET
+import numpy as np
+
+
+# the TraCI constant values, so subscription results are keyed exactly like the real ones
+VAR_SPEED = 0x40
+VAR_POSITION = 0x42
+VAR_LANE_ID = 0x51
+CMD_GET_VEHICLE_VARIABLE = 0xa4
+
+
+class TraCIException(Exception):
+    pass
+
+
+class FatalTraCIError(Exception):
+    pass
+
+
+def install_module():
+    # Registers a minimal `traci` module (constants and exceptions) when SUMO's traci is not installed,
+    # so main_ and the helpers can be imported on a machine without SUMO. Must run before they are imported.
+    try:
+        import traci
+        return traci
+    except ImportError:
+        pass
+    constants = types.SimpleNamespace(VAR_SPEED=VAR_SPEED, VAR_POSITION=VAR_POSITION, VAR_LANE_ID=VAR_LANE_ID,
+                                      CMD_GET_VEHICLE_VARIABLE=CMD_GET_VEHICLE_VARIABLE)
+    exceptions = types.SimpleNamespace(TraCIException=TraCIException, FatalTraCIError=FatalTraCIError)
+    module = types.ModuleType('traci')
+    module.constants = constants
+    module.exceptions = exceptions
+    module.TraCIException = TraCIException
+    module.FatalTraCIError = FatalTraCIError
+    sys.modules['traci'] = module
+    return module
+
+
+class Polylines:
+    # Many polylines packed into one array, so the positions of all vehicles are looked up by arc length at once
+
+    def __init__(self, shapes):
+        self.points = np.concatenate(shapes)
+        counts = np.array([len(shape) for shape in shapes])
+        self.first_points = np.cumsum(counts) - counts
+        self.last_points = self.first_points + counts - 1
+
+        segment_lengths = np.hypot(*np.diff(self.points, axis=0).T)
+        segment_lengths[self.last_points[:-1]] = 1.0 # gap between two polylines keeps the arc strictly increasing
+        self.arc = np.concatenate(([0.0], np.cumsum(segment_lengths)))
+        self.starts = self.arc[self.first_points]
+        self.lengths = self.arc[self.last_points] - self.starts
+
+    def positions(self, polylines, distances):
+        distances = np.clip(distances, 0.0, self.lengths[polylines])
+        query = self.starts[polylines] + distances
+        segments = np.searchsorted(self.arc, query, side='right') - 1
+        segments = np.clip(segments, self.first_points[polylines], np.maximum(self.last_points[polylines] - 1, self.first_points[polylines]))
+        following = np.minimum(segments + 1, self.last_points[polylines])
+        span = self.arc[following] - self.arc[segments]
+        fractions = np.divide(query - self.arc[segments], span, out=np.zeros_like(span), where=span > 0)[:, None]
+        return self.points[segments] + (self.points[following] - self.points[segments]) * fractions
+
+
+class SyntheticVehicles:
+    # `count` vehicles spread over the network lanes (weighted by length), each driving round its own lane
+    # at 50-100% of the speed limit. All of them depart at the first step.
+
+    def __init__(self, lanes, count, seed=0):
+        lanes = list(lanes.values())
+        rng = np.random.default_rng(seed)
+        lengths = np.array([lane.length for lane in lanes])
+        self.polylines = Polylines([lane.shape for lane in lanes])
+        self.lanes = rng.choice(len(lanes), size=count, p=lengths / lengths.sum())
+        self.lane_ids = np.array([lane.lane_id for lane in lanes], dtype=object)[self.lanes]
+        self.offsets = rng.uniform(0.0, 1.0, count) * self.polylines.lengths[self.lanes]
+        self.speeds = np.array([lane.speed for lane in lanes])[self.lanes] * rng.uniform(0.5, 1.0, count)
+        self.ids = np.array([f"veh{i}" for i in range(count)], dtype=object)
+        self.departed = False
+
+    def step(self, time):
+        distances = np.mod(self.offsets + self.speeds * time, np.maximum(self.polylines.lengths[self.lanes], 1e-9))
+        departed = [] if self.departed else self.ids.tolist()
+        self.departed = True
+        return self.ids, self.polylines.positions(self.lanes, distances), self.speeds, self.lane_ids, departed
+
+
+def read_routes(route_files):
+    # (vehicle id, depart time, edge ids) of every vehicle of the route files, sorted by departure
+    routes = []
+    for route_file in route_files:
+        named_routes = {}
+        for _, element in ET.iterparse(route_file, events=('end',)):
+            if element.tag == 'route' and element.get('id') is not None:
+                named_routes[element.get('id')] = element.get('edges').split()
+            elif element.tag == 'vehicle':
+                route = element.find('route')
+                edges = route.get('edges').split() if route is not None else named_routes.get(element.get('route'), [])
+                routes.append((element.get('id'), float(element.get('depart')), edges))
+                element.clear()
+    routes.sort(key=lambda route: route[1])
+    return routes
+
+
+class RouteReplay:
+    # Vehicles follow their routes (first lane of every edge) at `speed_factor` times the speed limit, from their
+    # departure until the end of the route. Positions are closed-form in time, so `start_time` jumps straight into
+    # a busy period of the scenario. The lane id is the lane driven, '' on the straight link between two lanes.
+
+    def __init__(self, lanes, routes, speed_factor=0.7, start_time=0.0):
+        edge_lanes = {}
+        for lane in lanes.values():
+            edge_lanes.setdefault(lane.edge_id, lane)
+        shapes, ids, departs, speeds, lane_ids, lane_points = [], [], [], [], [], []
+        for vehicle_id, depart, edges in routes:
+            route_lanes = [edge_lanes[edge] for edge in edges if edge in edge_lanes]
+            if not route_lanes:
+                continue
+            shapes.append(np.concatenate([lane.shape for lane in route_lanes]))
+            ids.append(vehicle_id)
+            departs.append(depart)
+            lengths = np.array([lane.length for lane in route_lanes])
+            speeds.append(speed_factor * np.dot(lengths, [lane.speed for lane in route_lanes]) / max(lengths.sum(), 1e-9))
+            lane_ids += [lane.lane_id for lane in route_lanes]
+            lane_points += [len(lane.shape) for lane in route_lanes]
+
+        self.polylines = Polylines(shapes)
+        self.ids = np.array(ids, dtype=object)
+        self.departs = np.array(departs)
+        self.speeds = np.array(speeds)
+        # arc length at the first and last point of every lane of every route, increasing over all routes
+        lane_points = np.array(lane_points, dtype=np.int64)
+        first_points = np.cumsum(lane_points) - lane_points
+        self.lane_starts = self.polylines.arc[first_points]
+        self.lane_ends = self.polylines.arc[first_points + lane_points - 1]
+        self.lane_ids = np.array(lane_ids + [''], dtype=object)
+        self.start_time = start_time
+        self.active = np.zeros(len(ids), dtype=bool)
+
+    def step(self, time):
+        time = time + self.start_time
+        distances = (time - self.departs) * self.speeds
+        active = (self.departs <= time) & (distances < self.polylines.lengths)
+        departed = self.ids[active & ~self.active].tolist()
+        self.active = active
+        indices = np.flatnonzero(active)
+        query = self.polylines.starts[indices] + distances[indices]
+        lanes = np.searchsorted(self.lane_starts, query, side='right') - 1
+        lanes[query > self.lane_ends[lanes]] = -1 # the last entry of lane_ids is ''
+        return self.ids[indices], self.polylines.positions(indices, distances[indices]), self.speeds[indices], self.lane_ids[lanes], departed
+
+
+class FakeTraci:
+    """
+    Backend stand-in for the traci module or libsumo with the calls SUAVPy makes. Vehicles come from a
+    SyntheticVehicles or RouteReplay source, POIs and polygons are accepted and ignored except for the
+    POI positions that context subscriptions are centred on.
+
+    Parameters:
+    source: Vehicle source with step(time) -> (ids, positions (V, 2), speeds, lane ids, departed ids).
+    step_length (float): Simulated seconds per simulationStep.
+    """
+
+    def __init__(self, source, step_length):
+        self.source = source
+        self.step_length = step_length
+        self.time = 0.0
+        self.ids = np.empty(0, dtype=object)
+        self.positions = np.empty((0, 2))
+        self.speeds = np.empty(0)
+        self.lane_ids = np.empty(0, dtype=object)
+        self.departed = []
+        self.variables = [VAR_POSITION, VAR_SPEED]
+        self.cached_results = None
+        self.simulation = FakeSimulation(self)
+        self.vehicle = FakeVehicle(self)
+        self.poi = FakePoi(self)
+        self.polygon = FakePolygon()
+
+    def simulationStep(self, time=0.0):
+        self.time += self.step_length
+        self.ids, self.positions, self.speeds, self.lane_ids, self.departed = self.source.step(self.time)
+        self.cached_results = None
+
+    def results(self, indices=None):
+        # subscription results like TraCI returns them: vehicle id -> {variable: value}
+        if indices is None:
+            if self.cached_results is None:
+                self.cached_results = self.results(np.arange(len(self.ids)))
+            return self.cached_results
+        columns = {VAR_POSITION: list(zip(*self.positions[indices].T.tolist())), VAR_SPEED: self.speeds[indices].tolist(),
+                   VAR_LANE_ID: self.lane_ids[indices].tolist()}
+        columns = [columns[variable] for variable in self.variables]
+        return {vehicle_id: dict(zip(self.variables, values)) for vehicle_id, *values in zip(self.ids[indices].tolist(), *columns)}
+
+    def subscribed_variables(self, variables):
+        if list(variables) != self.variables:
+            self.variables = list(variables)
+            self.cached_results = None
+
+    def close(self):
+        pass
+
+
+class FakeSimulation:
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.context = False
+
+    def getTime(self):
+        return self.backend.time
+
+    def getDepartedIDList(self):
+        return self.backend.departed
+
+    def saveState(self, file_name):
+        # the vehicle sources are functions of time, the time is the whole state
+        with open(file_name, 'w') as file:
+            file.write(f'<snapshot time="{self.backend.time!r}"/>\n')
+
+    def loadState(self, file_name):
+        self.backend.time = float(ET.parse(file_name).getroot().get('time'))
+        self.backend.ids, self.backend.positions, self.backend.speeds, self.backend.lane_ids, _ = self.backend.source.step(self.backend.time)
+        self.backend.departed = []
+        self.backend.cached_results = None
+
+    def subscribeContext(self, object_id, domain, distance, variables):
+        self.backend.subscribed_variables(variables)
+        self.context = True
+
+    def getContextSubscriptionResults(self, object_id):
+        return self.backend.results() if self.context else {}
+
+
+class FakeVehicle:
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.subscribed = set()
+
+    def subscribe(self, vehicle_id, variables):
+        self.backend.subscribed_variables(variables)
+        self.subscribed.add(vehicle_id)
+
+    def getIDList(self):
+        return self.backend.ids.tolist()
+
+    def getAllSubscriptionResults(self):
+        return {vehicle_id: values for vehicle_id, values in self.backend.results().items() if vehicle_id in self.subscribed}
+
+
+class FakePoi:
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.positions = {}
+        self.radii = {}
+
+    def add(self, poi_id, x, y, color, poiType='', layer=0, **kwargs):
+        self.positions[poi_id] = (x, y)
+
+    def setPosition(self, poi_id, x, y):
+        self.positions[poi_id] = (x, y)
+
+    def remove(self, poi_id, layer=0):
+        self.positions.pop(poi_id, None)
+        self.radii.pop(poi_id, None)
+
+    def subscribeContext(self, poi_id, domain, distance, variables):
+        self.backend.subscribed_variables(variables)
+        self.radii[poi_id] = distance
+
+    def getAllContextSubscriptionResults(self):
+        results = {}
+        for poi_id, radius in self.radii.items():
+            offsets = self.backend.positions - np.asarray(self.positions[poi_id])
+            results[poi_id] = self.backend.results(np.flatnonzero(np.einsum('vk,vk->v', offsets, offsets) <= radius * radius))
+        return results
+
+    def setAngle(self, poi_id, angle):
+        pass
+
+    def setHeight(self, poi_id, height):
+        pass
+
+    def setWidth(self, poi_id, width):
+        pass
+
+
+class FakePolygon:
+
+    def add(self, polygon_id, shape, color, fill=False, polygonType='', layer=0, lineWidth=1):
+        pass
+
+    def setShape(self, polygon_id, shape):
+        pass
+
+    def remove(self, polygon_id, layer=0):
+        pass
@@ -0,0 +1,110 @@
+"""
+Floating car data replay of SUAVPy
+"""
+
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+
+
+def iter_fcd(fcd_file):
+    # Streams a SUMO --fcd-output file, one (time, ids, positions (V, 2), speeds, lane ids) frame per timestep
+    for _, element in ET.iterparse(fcd_file, events=('end',)):
+        if element.tag != 'timestep':
+            continue
+        vehicles = element.findall('vehicle')
+        ids = np.array([vehicle.get('id') for vehicle in vehicles], dtype=object)
+        positions = np.array([(vehicle.get('x'), vehicle.get('y')) for vehicle in vehicles], dtype=np.float64).reshape(-1, 2)
+        speeds = np.array([vehicle.get('speed', 0) for vehicle in vehicles], dtype=np.float64)
+        lane_ids = np.array([vehicle.get('lane', '') for vehicle in vehicles], dtype=object)
+        yield float(element.get('time')), ids, positions, speeds, lane_ids
+        element.clear()
+
+
+def convert_fcd(fcd_file, cache_file):
+    """
+    Converts an FCD XML file into a columnar .npz cache that loads without XML parsing.
+
+    The cache holds one row per vehicle and timestep (`vehicle` and `lane` index into `vehicle_ids` and
+    `lane_ids`) and `offsets`, the first row of every entry of `times`.
+    """
+    times, counts, vehicles, lanes, positions, speeds = [], [], [], [], [], []
+    vehicle_index, lane_index = {}, {}
+    for time, ids, frame_positions, frame_speeds, lane_ids in iter_fcd(fcd_file):
+        times.append(time)
+        counts.append(len(ids))
+        vehicles.append(np.array([vehicle_index.setdefault(vehicle_id, len(vehicle_index)) for vehicle_id in ids], dtype=np.int32))
+        lanes.append(np.array([lane_index.setdefault(lane_id, len(lane_index)) for lane_id in lane_ids], dtype=np.int32))
+        positions.append(frame_positions)
+        speeds.append(frame_speeds)
+
+    positions = np.concatenate(positions) if positions else np.empty((0, 2))
+    # written under a name of this process and renamed, parallel replays and an interrupted conversion never leave
+    # a half-written cache
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(temp_file, 'wb') as file:
+            np.savez(file,
+                     times=np.array(times, dtype=np.float64),
+                     offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+                     vehicle=np.concatenate(vehicles) if vehicles else np.empty(0, dtype=np.int32),
+                     lane=np.concatenate(lanes) if lanes else np.empty(0, dtype=np.int32),
+                     x=positions[:, 0], y=positions[:, 1],
+                     speed=np.concatenate(speeds) if speeds else np.empty(0),
+                     vehicle_ids=np.array(list(vehicle_index), dtype=str),
+                     lane_ids=np.array(list(lane_index), dtype=str))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, cache_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def iter_fcd_cache(cache_file):
+    with np.load(cache_file, allow_pickle=False) as cache:
+        columns = {name: cache[name] for name in cache.files}
+    vehicle_ids = columns['vehicle_ids'].astype(object)
+    lane_ids = columns['lane_ids'].astype(object)
+    positions = np.column_stack((columns['x'], columns['y']))
+    offsets = columns['offsets']
+    for i, time in enumerate(columns['times'].tolist()):
+        rows = slice(offsets[i], offsets[i + 1])
+        yield time, vehicle_ids[columns['vehicle'][rows]], positions[rows], columns['speed'][rows], lane_ids[columns['lane'][rows]]
+
+
+def open_fcd(fcd_file, cache=True):
+    # Frames of an FCD file: from the .npz cache if `fcd_file` is one, otherwise from the XML, which is converted
+    # to '<name>.fcd.npz' next to it first when `cache` is on (and the cache is missing or older than the XML)
+    if not os.path.exists(fcd_file):
+        raise FileNotFoundError(f"FCD file {fcd_file} not found.")
+    if fcd_file.endswith('.npz'):
+        return iter_fcd_cache(fcd_file)
+    if not cache:
+        return iter_fcd(fcd_file)
+
+    cache_file = os.path.splitext(fcd_file)[0] + '.fcd.npz'
+    if not os.path.exists(cache_file) or os.path.getmtime(cache_file) < os.path.getmtime(fcd_file):
+        print(f" Converting {fcd_file} to {cache_file}")
+        convert_fcd(fcd_file, cache_file)
+    return iter_fcd_cache(cache_file)
+
+
+class FcdVehicles:
+    # Vehicle source for the TraCI stand-in (_fake_traci.FakeTraci): each step shows the last recorded timestep
+    # at or before the simulation time, vehicles seen for the first time are reported as departed.
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.next_frame = next(self.frames, None)
+        self.frame = (0.0, np.empty(0, dtype=object), np.empty((0, 2)), np.empty(0), np.empty(0, dtype=object))
+        self.seen = set()
+
+    def step(self, time):
+        while self.next_frame is not None and self.next_frame[0] <= time + 1e-6:
+            self.frame = self.next_frame
+            self.next_frame = next(self.frames, None)
+        _, ids, positions, speeds, lane_ids = self.frame
+        departed = [vehicle_id for vehicle_id in ids.tolist() if vehicle_id not in self.seen]
+        self.seen.update(departed)
+        return ids, positions, speeds, lane_ids, departed
@@ -0,0 +1,113 @@
+"""
+UAV fleet state of SUAVPy
+"""
+
+import numpy as np
+
+
+class PackedPaths:
+    # The samples of all trajectories in single pool arrays, so the poses of all UAVs are gathered at once. A new
+    # snapshot only rewrites the UAVs whose Trajectory object changed: in place when the new path fits the slot of
+    # the old one, otherwise at the end of the pool, which is compacted and doubled when it is full.
+    # The step lookups of all trajectories are stacked the same way, one row per UAV, so the cursors of a step
+    # are a single column read.
+
+    def __init__(self, snapshot):
+        num_UAVs = len(snapshot)
+        self.trajectories = [None] * num_UAVs
+        self.offsets = np.zeros(num_UAVs, dtype=np.int64) # first sample of every UAV in the pool
+        self.lengths = np.zeros(num_UAVs, dtype=np.int64)
+        self.capacities = np.zeros(num_UAVs, dtype=np.int64) # size of the slot of every UAV
+        self.end = 0 # first unused sample of the pool
+        total = sum(len(trajectory.yaw_angles) for trajectory in snapshot)
+        self.positions = np.zeros((total, 3))
+        self.yaw_angles = np.zeros(total)
+        width = max((len(trajectory.step_index) for trajectory in snapshot), default=0)
+        self.step_index = np.full((num_UAVs, width), -1, dtype=np.int32) # (UAVs, total steps + 1) step -> sample
+        self.update(snapshot)
+
+    def update(self, snapshot):
+        for uav_id, trajectory in enumerate(snapshot):
+            if trajectory is not self.trajectories[uav_id]:
+                self.store(uav_id, trajectory)
+        self.snapshot = snapshot
+
+    def store(self, uav_id, trajectory):
+        length = len(trajectory.yaw_angles)
+        if length > self.capacities[uav_id]:
+            if self.end + length > len(self.yaw_angles):
+                self.repack(length)
+            self.offsets[uav_id], self.capacities[uav_id] = self.end, length
+            self.end += length
+        start = self.offsets[uav_id]
+        self.positions[start:start + length] = trajectory.positions
+        self.yaw_angles[start:start + length] = trajectory.yaw_angles
+        self.lengths[uav_id] = length
+        width = min(len(trajectory.step_index), self.step_index.shape[1])
+        self.step_index[uav_id, :width] = trajectory.step_index[:width]
+        self.step_index[uav_id, width:] = -1
+        self.trajectories[uav_id] = trajectory
+
+    def repack(self, extra):
+        # moves the used samples to the front of a pool twice their size (plus `extra`), dropping the unused slots
+        size = 2 * (int(self.lengths.sum()) + extra)
+        positions, yaw_angles = np.zeros((size, 3)), np.zeros(size)
+        offsets = np.cumsum(self.lengths) - self.lengths
+        for uav_id, (old, new, length) in enumerate(zip(self.offsets.tolist(), offsets.tolist(), self.lengths.tolist())):
+            positions[new:new + length] = self.positions[old:old + length]
+            yaw_angles[new:new + length] = self.yaw_angles[old:old + length]
+        self.positions, self.yaw_angles = positions, yaw_angles
+        self.offsets, self.capacities = offsets, self.lengths.copy()
+        self.end = int(self.lengths.sum())
+
+    def cursors(self, step):
+        # sample of `step` in every trajectory, -1 if the UAV has none
+        if step >= self.step_index.shape[1]:
+            return np.full(len(self.trajectories), -1, dtype=np.int64)
+        return self.step_index[:, step].astype(np.int64)
+
+    def samples(self, cursors):
+        # pool sample of every UAV for per-UAV sample numbers (clipped into the array, callers mask the invalid ones)
+        return np.clip(self.offsets + np.maximum(cursors, 0), 0, max(len(self.yaw_angles) - 1, 0))
+
+
+class FleetState:
+    """
+    State of all UAVs at the current step, one array entry per UAV id.
+
+    cursors: sample of the current step in every trajectory, -1 if the UAV has none
+    active: the UAV has a sample at this step
+    positions, yaw_angles: pose at the current sample (only meaningful where active)
+    moved: the pose differs from the previous sample
+    """
+
+    def __init__(self, num_UAVs):
+        self.uav_ids = np.arange(num_UAVs)
+        self.cursors = np.full(num_UAVs, -1, dtype=np.int64)
+        self.active = np.zeros(num_UAVs, dtype=bool)
+        self.positions = np.zeros((num_UAVs, 3))
+        self.yaw_angles = np.zeros(num_UAVs)
+        self.moved = np.zeros(num_UAVs, dtype=bool)
+        self.paths = None
+
+    def advance(self, snapshot, step):
+        # moves every UAV to its sample of `step` in the given path snapshot
+        if self.paths is None:
+            self.paths = PackedPaths(snapshot)
+        elif self.paths.snapshot is not snapshot:
+            self.paths.update(snapshot) # only the UAVs whose path changed
+        paths = self.paths
+
+        self.cursors = paths.cursors(step)
+        self.active = (self.cursors >= 0) & (self.cursors < paths.lengths)
+
+        samples = paths.samples(self.cursors)
+        self.positions = paths.positions[samples]
+        self.yaw_angles = paths.yaw_angles[samples]
+        previous = paths.samples(self.cursors - 1)
+        self.moved = self.active & (self.cursors > 0) & (np.any(paths.positions[previous] != self.positions, axis=1) | (paths.yaw_angles[previous] != self.yaw_angles))
+
+    def first_poses(self):
+        # position and yaw of the first sample of every UAV
+        samples = self.paths.samples(np.zeros(len(self.uav_ids), dtype=np.int64))
+        return self.paths.positions[samples], self.paths.yaw_angles[samples]
@@ -0,0 +1,113 @@
+"""
+sumo-gui updates of SUAVPy
+"""
+
+import time
+import numpy as np
+
+
+class GuiUpdater:
+    # FOV polygons and UAV POIs drawn in sumo-gui. TraCI calls that would not visibly change the drawing are skipped:
+    # a UAV is re-sent only when it moved more than `threshold` metres or turned more than `angle_threshold` degrees
+    # since the state last sent, steps are rendered at most `render_rate` times per second (wall clock, 0 renders
+    # every step) and the POI position, angle and size are each sent only when they changed.
+    # A UAV that comes to rest is always sent once more, so it is drawn at its exact final pose.
+    # The drawn state is kept as arrays over the fleet, so finding the UAVs to redraw is one vector operation.
+
+    def __init__(self, backend, calc, fov_degrees, num_UAVs, icon_path, threshold=0.0, angle_threshold=0.0, render_rate=0.0):
+        self.traci = backend
+        self.calc = calc
+        self.fov_degrees = fov_degrees
+        self.icon_path = icon_path
+        self.threshold = threshold
+        self.angle_threshold = angle_threshold
+        self.frame_interval = 1.0 / render_rate if render_rate > 0 else 0.0
+        self.next_frame = 0.0
+        self.render = True
+
+        self.polygon_ids = [f"fov_polygon_{i}" for i in range(num_UAVs)]
+        self.border_polygon_ids = [f"fov_border_polygon_{i}" for i in range(num_UAVs)]
+        self.poi_ids = [f"uav_poi_{i}" for i in range(num_UAVs)]
+        self.polygon_drawn = np.zeros(num_UAVs, dtype=bool)
+        self.poi_drawn = np.zeros(num_UAVs, dtype=bool)
+        self.polygon_poses = np.full((num_UAVs, 4), np.nan) # (x, y, z, yaw) the polygon is drawn at
+        self.poi_poses = np.full((num_UAVs, 4), np.nan)
+        self.poi_states = np.full((num_UAVs, 4), np.nan) # x, y, angle, size last sent to the POI
+
+    def begin_step(self):
+        # decides once per step whether this step is rendered
+        if self.frame_interval:
+            now = time.perf_counter()
+            self.render = now >= self.next_frame
+            if self.render:
+                self.next_frame = now + self.frame_interval
+
+    def polygon_exists(self, uav_id):
+        return self.polygon_drawn[uav_id]
+
+    def poi_exists(self, uav_id):
+        return self.poi_drawn[uav_id]
+
+    def add(self, uav_id, position, yaw_angle):
+        self.add_polygon(uav_id, position, yaw_angle)
+        self.calc.add_poi(self.poi_ids[uav_id], position, yaw_angle, self.icon_path)
+        self.poi_drawn[uav_id] = True
+        self.poi_poses[uav_id] = self.pose(position, yaw_angle)
+        self.poi_states[uav_id] = [position[0], position[1], yaw_angle, np.nan] # the size is set by the first update
+
+    def add_polygon(self, uav_id, position, yaw_angle):
+        field_of_view_size = self.calc.fov_calculation(self.fov_degrees, position[2])
+        self.calc.add_fov_polygon(position, field_of_view_size, yaw_angle, self.polygon_ids[uav_id], self.border_polygon_ids[uav_id])
+        self.polygon_drawn[uav_id] = True
+        self.polygon_poses[uav_id] = self.pose(position, yaw_angle)
+
+    def remove(self, uav_id):
+        self.remove_polygon(uav_id)
+        if self.poi_drawn[uav_id]:
+            self.calc.remove_poi(self.poi_ids[uav_id])
+            self.poi_drawn[uav_id] = False
+
+    def remove_polygon(self, uav_id):
+        if self.polygon_drawn[uav_id]:
+            self.calc.remove_fov_polygon(self.polygon_ids[uav_id], self.border_polygon_ids[uav_id])
+            self.polygon_drawn[uav_id] = False
+
+    def update(self, visible, positions, yaw_angles, moved):
+        # Called every step with the fleet arrays: `visible` UAVs have a pose this step, `moved` is False once a UAV holds its pose
+        if not self.render:
+            return
+        poses = np.column_stack((positions, yaw_angles))
+
+        for uav_id in np.flatnonzero(visible & self.polygon_drawn & self.changed(self.polygon_poses, poses, moved)):
+            field_of_view_size = self.calc.fov_calculation(self.fov_degrees, positions[uav_id][2])
+            self.calc.update_fov_polygon(positions[uav_id], field_of_view_size, yaw_angles[uav_id], self.polygon_ids[uav_id], self.border_polygon_ids[uav_id])
+            self.polygon_poses[uav_id] = poses[uav_id]
+
+        for uav_id in np.flatnonzero(visible & self.poi_drawn & self.changed(self.poi_poses, poses, moved)):
+            self.update_poi(uav_id, poses[uav_id])
+            self.poi_poses[uav_id] = poses[uav_id]
+
+    def update_poi(self, uav_id, pose):
+        x, y, z, yaw_angle = pose.tolist()
+        poi_id = self.poi_ids[uav_id]
+        sent_x, sent_y, sent_angle, sent_size = self.poi_states[uav_id].tolist()
+        if (x, y) != (sent_x, sent_y):
+            self.traci.poi.setPosition(poi_id, x, y)
+        if yaw_angle != sent_angle:
+            self.traci.poi.setAngle(poi_id, yaw_angle)
+        size = z * 0.25
+        if size != sent_size:
+            self.traci.poi.setHeight(poi_id, size)
+            self.traci.poi.setWidth(poi_id, size)
+        self.poi_states[uav_id] = [x, y, yaw_angle, size]
+
+    def changed(self, drawn_poses, poses, moved):
+        # at rest any difference is redrawn, while moving only differences above the thresholds
+        offsets = poses - drawn_poses
+        turns = np.abs((offsets[:, 3] + 180) % 360 - 180)
+        beyond_threshold = (np.hypot(offsets[:, 0], offsets[:, 1]) > self.threshold) | (np.abs(offsets[:, 2]) > self.threshold) | (turns > self.angle_threshold)
+        return np.where(moved, beyond_threshold, np.any(poses != drawn_poses, axis=1))
+
+    def pose(self, position, yaw_angle):
+        x, y, z = position
+        return (x, y, z, yaw_angle)
@@ -0,0 +1,117 @@
+"""
+Tkinter windows of SUAVPy, only imported when the run has a GUI
+"""
+
+import queue
+import tkinter as tk
+from tkinter import messagebox, ttk, Toplevel, Label
+from _events import BATTERY_WARNING, SIGNAL_LOST
+
+
+WARNING_TITLES = {BATTERY_WARNING: "Battery Warning", SIGNAL_LOST: "Signal Lost"}
+
+
+def non_blocking_warning(title, message, master=None):
+    warning_window = Toplevel(master)
+    warning_window.title(title)
+    warning_window.geometry("300x80")
+    warning_window.configure(bg='#2E2E2E')
+    icon_path = "images/kiosLogo.ico"
+    warning_window.iconbitmap(icon_path)
+    
+    
+    label = Label(warning_window, text=message, bg='#2E2E2E', bd =5, fg='#FFFFFF', font=('Helvetica', 10))
+    label.pack(pady=10)
+
+    warning_window.after(5000, warning_window.destroy)  # Automatically close after 5 seconds
+    warning_window.attributes("-topmost", True) 
+    
+
+def get_uav_position_input():
+    root = tk.Tk()
+    
+    root.title("Local GUI")
+    
+    root.withdraw()
+
+    # Set the window icon
+    icon_path = "images/kiosLogo.ico"
+    root.iconbitmap(icon_path)
+    
+    root.geometry("400x250")
+    #root.resizable(False, False)
+
+    # Apply a dark theme
+    root.configure(bg='#2E2E2E')
+
+    style = ttk.Style()
+    style.theme_use('alt')  # Using 'alt' as a base theme for customization
+
+    # Configure the style to match a dark theme
+    style.configure('TButton', font=('Helvetica', 11), padding=6, background='#2E2E2E', foreground='#FFFFFF')
+    style.configure('TLabel', font=('Helvetica', 11), padding=5, background='#2E2E2E', foreground='#FFFFFF')
+    style.configure('TEntry', font=('Helvetica', 11), padding=5, fieldbackground='#3C3F41', foreground='#FFFFFF')
+
+    # Create a dialog window for input
+    dialog = tk.Toplevel(root)
+    dialog.configure(bg='#2E2E2E')
+    dialog.iconbitmap(icon_path)
+    
+    dialog.attributes("-topmost", True)
+
+    # UAV ID input
+    uav_id_label = tk.Label(dialog, text="Enter UAV ID:", bg='#2E2E2E', fg='#FFFFFF', font=('Helvetica', 11))
+    uav_id_label.grid(row=0, column=0, sticky='nsew', padx=5, pady=5)  # Centered with 'nsew' sticky option
+    uav_id_entry = tk.Entry(dialog, bg='#3C3F41', fg='#FFFFFF', insertbackground='#FFFFFF', font=('Helvetica', 11))
+    uav_id_entry.grid(row=0, column=1, padx=5, pady=5)
+
+    # UAV position input
+    position_label = tk.Label(dialog, text="Enter UAV position as \n (t, x, y, z, φ):", bg='#2E2E2E', fg='#FFFFFF', font=('Arimo', 11))
+    position_label.grid(row=1, column=0, sticky='nsew', padx=5, pady=5)  # Centered with 'nsew' sticky option
+    position_entry = tk.Entry(dialog, bg='#3C3F41', fg='#FFFFFF', insertbackground='#FFFFFF', font=('Helvetica', 11))
+    position_entry.grid(row=1, column=1, padx=5, pady=5)
+
+    # Button frame
+    button_frame = tk.Frame(dialog, bg='#2E2E2E')
+    button_frame.grid(row=2, columnspan=2, pady=20)
+
+    # Submit button (green)
+    submit_button = tk.Button(button_frame, text="Submit", bg='#4CAF50', fg='#FFFFFF', activebackground='#45A049', font=('Helvetica', 11), command=root.quit)
+    submit_button.grid(row=0, column=0, padx=10)
+
+    # Break button (red) that sends 'break'
+    break_button = tk.Button(button_frame, text="Break", bg='#F44336', fg='#FFFFFF', activebackground='#E57373', font=('Helvetica', 11), command=lambda: (uav_id_entry.insert(0, "break"), root.quit()))
+    break_button.grid(row=0, column=1, padx=10)
+
+    
+    root.mainloop()
+
+    uav_id_value = uav_id_entry.get()
+    position_value = position_entry.get()
+
+    root.destroy()
+    return uav_id_value, position_value
+
+
+class WarningWindows:
+    # Event sink that shows each event in a non-blocking window. Events are published by the simulation thread and
+    # Tkinter is only used from the thread of its root, so they are queued and the root polls the queue.
+
+    def __init__(self, root, poll_ms=100):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.events = queue.SimpleQueue()
+        self.root.after(self.poll_ms, self.poll)
+
+    def __call__(self, record):
+        self.events.put(record)
+
+    def poll(self):
+        while not self.events.empty():
+            record = self.events.get()
+            non_blocking_warning(WARNING_TITLES.get(record['event'], record['event']), record['message'], self.root)
+        self.root.after(self.poll_ms, self.poll)
+
+
+def show_error(title, message):
+    messagebox.showerror(title, message)
@@ -0,0 +1,105 @@
+"""
+SUMO network reader of SUAVPy
+"""
+
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+
+
+class Lane:
+    __slots__ = ('lane_id', 'edge_id', 'shape', 'speed', 'length')
+
+    def __init__(self, lane_id, edge_id, shape, speed, length):
+        self.lane_id = lane_id
+        self.edge_id = edge_id
+        self.shape = shape # (P, 2) polyline
+        self.speed = speed # speed limit in m/s
+        self.length = length
+
+
+def parse_shape(shape):
+    return np.array([point.split(',')[:2] for point in shape.split()], dtype=np.float64)
+
+
+def read_boundary(network_file):
+    # convBoundary of the <location> element: (min_x, min_y, max_x, max_y) in network coordinates
+    for _, element in ET.iterparse(network_file, events=('start',)):
+        if element.tag == 'location':
+            return tuple(float(value) for value in element.get('convBoundary').split(','))
+    raise ValueError(f"Network file {network_file} has no location")
+
+
+def read_lanes(network_file, internal=False):
+    """
+    Streams the lanes of a SUMO .net.xml, the file is never loaded as a whole.
+
+    Parameters:
+    network_file (str): Path to the network file.
+    internal (bool): Also return the lanes of internal (junction) edges.
+
+    Returns:
+    dict: Lane id -> Lane, in file order.
+    """
+    lanes = {}
+    edge_id = None
+    for event, element in ET.iterparse(network_file, events=('start', 'end')):
+        if event == 'start':
+            if element.tag == 'edge':
+                edge_id = element.get('id') if internal or element.get('function') != 'internal' else None
+            continue
+        if element.tag == 'lane' and edge_id is not None:
+            lanes[element.get('id')] = Lane(element.get('id'), edge_id, parse_shape(element.get('shape')),
+                                            float(element.get('speed')), float(element.get('length')))
+        elif element.tag == 'edge':
+            edge_id = None
+            element.clear()
+    return lanes
+
+
+class LaneShapes:
+    # The lane shapes of a network packed into single arrays: the points of lane i are points[offsets[i]:offsets[i + 1]]
+
+    def __init__(self, lane_ids, offsets, points):
+        self.lane_ids = lane_ids
+        self.offsets = offsets
+        self.points = points
+        self.index = {lane_id: i for i, lane_id in enumerate(lane_ids.tolist())}
+        # (min_x, min_y, max_x, max_y) of every lane
+        starts = offsets[:-1]
+        self.bounds = np.column_stack((np.minimum.reduceat(points, starts), np.maximum.reduceat(points, starts))) if len(starts) else np.empty((0, 4))
+
+    def __len__(self):
+        return len(self.lane_ids)
+
+
+def pack_lanes(lanes):
+    shapes = [lane.shape for lane in lanes.values()]
+    counts = np.array([len(shape) for shape in shapes], dtype=np.int64)
+    return LaneShapes(np.array(list(lanes), dtype=str), np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+                      np.concatenate(shapes) if shapes else np.empty((0, 2)))
+
+
+def open_lane_shapes(network_file, cache=True):
+    # All lane shapes of the network, internal (junction) lanes included. With `cache` the network is parsed
+    # once and stored as '<name>.lanes.npz' next to it, which is rebuilt when the network is newer.
+    if not cache:
+        return pack_lanes(read_lanes(network_file, internal=True))
+    cache_file = network_file[:-len('.net.xml')] if network_file.endswith('.net.xml') else os.path.splitext(network_file)[0]
+    cache_file += '.lanes.npz'
+    if not os.path.exists(cache_file) or os.path.getmtime(cache_file) < os.path.getmtime(network_file):
+        shapes = pack_lanes(read_lanes(network_file, internal=True))
+        # written under a name of this process and renamed, parallel runs and a crash never leave a half-written cache
+        temp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(temp_file, 'wb') as file:
+                np.savez(file, lane_ids=shapes.lane_ids, offsets=shapes.offsets, points=shapes.points)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_file, cache_file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        return shapes
+    with np.load(cache_file, allow_pickle=False) as arrays:
+        return LaneShapes(arrays['lane_ids'], arrays['offsets'], arrays['points'])
@@ -0,0 +1,263 @@
+"""
+Output writers of SUAVPy
+"""
+
+import csv
+import os
+import queue
+import threading
+import zipfile
+import numpy as np
+from _profiling import timing_decorator
+
+
+COLUMNS = ['Step', 'Seconds', 'UAV_ID', 'UAV_X', 'UAV_Y', 'UAV_Z', 'Yaw', 'VehicleID', 'X', 'Y', 'Speed']
+EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow', 'npz': '.npz'}
+NO_VEHICLES = np.empty(0, dtype=np.int64)
+
+
+def step_columns(step, seconds, uav_ids, uav_positions, yaw_angles, vehicles_in_view, vehicle_grid):
+    # Columns of one step: a state row per UAV followed by one row per vehicle in its FOV.
+    # Vehicle columns of the state rows are '' (VehicleID) and NaN (X, Y, Speed).
+    counts = np.array([len(in_view) for in_view in vehicles_in_view], dtype=np.int64)
+    uav_rows = np.repeat(np.arange(len(uav_ids)), counts + 1)
+    vehicle_rows = np.ones(len(uav_rows), dtype=bool)
+    vehicle_rows[np.cumsum(counts + 1) - (counts + 1)] = False
+    vehicles = np.concatenate(vehicles_in_view) if len(vehicles_in_view) else NO_VEHICLES
+
+    uav_positions = np.asarray(uav_positions, dtype=np.float64).reshape(-1, 3)[uav_rows]
+    vehicle_ids = np.full(len(uav_rows), '', dtype=object)
+    vehicle_ids[vehicle_rows] = [vehicle_grid.vehicle_ids[i] for i in vehicles]
+    vehicle_positions = np.full((len(uav_rows), 2), np.nan)
+    vehicle_positions[vehicle_rows] = vehicle_grid.positions[vehicles]
+    speeds = np.full(len(uav_rows), np.nan)
+    speeds[vehicle_rows] = vehicle_grid.speeds[vehicles]
+
+    return {'Step': np.full(len(uav_rows), step, dtype=np.int64),
+            'Seconds': np.full(len(uav_rows), seconds, dtype=np.float64),
+            'UAV_ID': np.asarray(uav_ids, dtype=np.int64)[uav_rows],
+            'UAV_X': uav_positions[:, 0],
+            'UAV_Y': uav_positions[:, 1],
+            'UAV_Z': uav_positions[:, 2],
+            'Yaw': np.asarray(yaw_angles, dtype=np.float64)[uav_rows],
+            'VehicleID': vehicle_ids,
+            'X': vehicle_positions[:, 0],
+            'Y': vehicle_positions[:, 1],
+            'Speed': speeds}
+
+
+class BufferedSink:
+    # Collects the step columns in memory and hands them to write_chunk in large blocks
+
+    def __init__(self, output_file, buffer_rows=100000):
+        self.output_file = output_file
+        self.buffer_rows = buffer_rows
+        self.chunks = []
+        self.buffered_rows = 0
+        self.chunk_count = 0
+
+    def append(self, columns):
+        rows = len(columns['Step'])
+        if rows == 0:
+            return
+        self.chunks.append(columns)
+        self.buffered_rows += rows
+        if self.buffered_rows >= self.buffer_rows:
+            self.flush()
+
+    @timing_decorator # runs in the writer thread when the output is asynchronous
+    def flush(self):
+        if not self.chunks:
+            return
+        columns = {name: np.concatenate([chunk[name] for chunk in self.chunks]) for name in COLUMNS}
+        self.chunks = []
+        self.buffered_rows = 0
+        self.write_chunk(columns)
+        self.chunk_count += 1
+
+    def write_chunk(self, columns):
+        raise NotImplementedError
+
+    def checkpoint(self):
+        # writes everything appended so far and returns the file offset a resumed run continues at
+        raise ValueError('Checkpoints need the csv output format')
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CsvSink(BufferedSink):
+    # resume_offset continues a checkpointed run: rows written after the checkpoint are cut off and appended again
+
+    def __init__(self, output_file, buffer_rows=100000, resume_offset=None):
+        super().__init__(output_file, buffer_rows)
+        if resume_offset is None:
+            self.file = open(output_file, mode='w', newline='')
+        else:
+            self.file = open(output_file, mode='r+', newline='')
+            self.file.truncate(resume_offset)
+            self.file.seek(resume_offset)
+        self.writer = csv.writer(self.file, delimiter=',')
+        if resume_offset is None:
+            self.writer.writerow(COLUMNS)
+
+    def checkpoint(self):
+        self.flush()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def write_chunk(self, columns):
+        # values are written as repr of their column type, the float columns (UAV pose included) always as floats
+        state_rows = np.isnan(columns['X'])
+        vehicle_columns = []
+        for name in ('X', 'Y', 'Speed'):
+            values = columns[name].astype(object)
+            values[state_rows] = ''
+            vehicle_columns.append(values.tolist())
+        self.writer.writerows(zip(*(columns[name].tolist() for name in COLUMNS[:8]), *vehicle_columns))
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class ArrowSink(BufferedSink):
+    # Parquet row groups or Arrow IPC record batches, one block per flush
+
+    def __init__(self, output_file, buffer_rows=100000, output_format='parquet'):
+        super().__init__(output_file, buffer_rows)
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("The parquet and arrow output formats need pyarrow (pip install pyarrow).")
+        self.pa = pa
+        self.schema = pa.schema([('Step', pa.int64()), ('Seconds', pa.float64()), ('UAV_ID', pa.int64()),
+                                 ('UAV_X', pa.float64()), ('UAV_Y', pa.float64()), ('UAV_Z', pa.float64()),
+                                 ('Yaw', pa.float64()), ('VehicleID', pa.string()),
+                                 ('X', pa.float64()), ('Y', pa.float64()), ('Speed', pa.float64())])
+        if output_format == 'parquet':
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(output_file, self.schema, compression='zstd')
+        else:
+            self.writer = pa.ipc.new_file(output_file, self.schema)
+
+    def write_chunk(self, columns):
+        arrays = [self.pa.array(columns[name].tolist() if name == 'VehicleID' else columns[name], type=self.schema.field(name).type) for name in COLUMNS]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+
+class NpzSink(BufferedSink):
+    # Compressed .npz with one '<column>/<chunk>' entry per flush, read_output concatenates the chunks
+
+    def __init__(self, output_file, buffer_rows=100000):
+        super().__init__(output_file, buffer_rows)
+        self.archive = zipfile.ZipFile(output_file, mode='w', compression=zipfile.ZIP_DEFLATED)
+
+    def write_chunk(self, columns):
+        for name in COLUMNS:
+            values = columns[name].astype(str) if name == 'VehicleID' else columns[name]
+            with self.archive.open(f"{name}/{self.chunk_count:06d}.npy", mode='w', force_zip64=True) as entry:
+                np.lib.format.write_array(entry, values, allow_pickle=False)
+
+    def close(self):
+        super().close()
+        self.archive.close()
+
+
+class AsyncSink:
+    # Hands the step blocks to a background writer thread through a bounded queue, so a slow disk does not
+    # stall the simulation. When the queue is full 'block' waits for the writer and 'drop' discards the block.
+
+    def __init__(self, sink, queue_size=256, policy='block'):
+        if policy not in ('block', 'drop'):
+            raise ValueError('Output backpressure policy does not exist')
+        self.sink = sink
+        self.policy = policy
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped_rows = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.drain, name='output-writer', daemon=True)
+        self.thread.start()
+
+    def drain(self):
+        while True:
+            columns = self.queue.get()
+            if columns is None:
+                break
+            if self.error is None: # keep consuming after an error so the simulation never blocks on a dead writer
+                try:
+                    self.sink.append(columns)
+                except Exception as e:
+                    self.error = e
+            self.queue.task_done()
+
+    def append(self, columns):
+        if self.error is not None:
+            raise self.error
+        if self.policy == 'drop':
+            try:
+                self.queue.put_nowait(columns)
+            except queue.Full:
+                self.dropped_rows += len(columns['Step'])
+        else:
+            self.queue.put(columns)
+
+    def checkpoint(self):
+        # waits until the writer has taken every queued block, the writer is idle while the sink is flushed
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+        return self.sink.checkpoint()
+
+    def close(self):
+        # final flush: everything queued so far is written before the file is closed
+        self.queue.put(None)
+        self.thread.join()
+        self.sink.close()
+        if self.dropped_rows:
+            print(f" Output queue was full, {self.dropped_rows} rows were dropped")
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_output(output_file, output_format='csv', buffer_rows=100000, queue_size=0, policy='block', resume_offset=None):
+    # queue_size > 0 writes from a background thread, resume_offset (csv only) continues the file of a checkpointed run
+    if output_format not in EXTENSIONS:
+        raise ValueError('Output format does not exist')
+    output_file = os.path.splitext(output_file)[0] + EXTENSIONS[output_format]
+    if resume_offset is not None and output_format != 'csv':
+        raise ValueError('Checkpoints need the csv output format')
+    if output_format == 'csv':
+        sink = CsvSink(output_file, buffer_rows, resume_offset)
+    elif output_format == 'npz':
+        sink = NpzSink(output_file, buffer_rows)
+    else:
+        sink = ArrowSink(output_file, buffer_rows, output_format)
+    return AsyncSink(sink, queue_size, policy) if queue_size > 0 else sink
+
+
+def read_output(output_file):
+    # Loads an .npz output as one array per column
+    columns = {}
+    with np.load(output_file, allow_pickle=False) as archive:
+        for name in COLUMNS:
+            chunks = [archive[key] for key in sorted(archive.files) if key.split('/')[0] == name]
+            columns[name] = np.concatenate(chunks) if chunks else np.empty(0)
+    return columns
@@ -0,0 +1,198 @@
+"""
+Profiling of SUAVPy
+"""
+
+import csv
+import functools
+import os
+import threading
+import time
+import ujson as json
+
+
+def bucket_of(elapsed_ns):
+    # Log-linear histogram bucket: 8 sub-buckets per power of two (about 12% resolution), values < 16 ns are exact
+    exponent = elapsed_ns.bit_length()
+    if exponent <= 4:
+        return elapsed_ns
+    return (exponent << 3) | ((elapsed_ns >> (exponent - 4)) & 7)
+
+
+def bucket_bounds(bucket):
+    if bucket < 16:
+        return bucket, bucket + 1
+    exponent, mantissa = bucket >> 3, bucket & 7
+    lower = (8 | mantissa) << (exponent - 4)
+    return lower, lower + (1 << (exponent - 4))
+
+
+class Histogram:
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.buckets = {}
+
+    def add(self, elapsed_ns):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        self.min_ns = elapsed_ns if self.min_ns is None else min(self.min_ns, elapsed_ns)
+        self.max_ns = max(self.max_ns, elapsed_ns)
+        bucket = bucket_of(elapsed_ns)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, q):
+        # upper bound of the bucket that holds the q-quantile
+        rank = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(bucket_bounds(bucket)[1], self.max_ns)
+        return self.max_ns
+
+    def summary(self):
+        return {'count': self.count,
+                'total_ms': self.total_ns / 1e6,
+                'mean_us': self.total_ns / self.count / 1e3 if self.count else 0.0,
+                'min_us': (self.min_ns or 0) / 1e3,
+                'p50_us': self.percentile(0.5) / 1e3,
+                'p90_us': self.percentile(0.9) / 1e3,
+                'p99_us': self.percentile(0.99) / 1e3,
+                'max_us': self.max_ns / 1e3}
+
+
+class StepTimer:
+    # Splits one simulation step into phases: mark(name) charges the time since the previous mark to `name`,
+    # end_step() adds the per-step total of every phase to its histogram.
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.phases = {}
+        self.last = time.perf_counter_ns()
+
+    def mark(self, name):
+        now = time.perf_counter_ns()
+        self.phases[name] = self.phases.get(name, 0) + now - self.last
+        self.last = now
+
+    def end_step(self):
+        self.mark('other')
+        for name, elapsed_ns in self.phases.items():
+            self.profiler.record('phase', name, elapsed_ns)
+        self.profiler.record('phase', 'step', sum(self.phases.values()))
+        self.phases = {}
+
+
+class NullTimer:
+    # used while profiling is off
+
+    def mark(self, name):
+        pass
+
+    def end_step(self):
+        pass
+
+
+class Profiler:
+    # Process-wide timing histograms, safe to record into from the simulation, server and output writer threads
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.instrumented = [] # (class, attribute, timing_decorator) of every timed method
+
+    def enable(self):
+        self.enabled = True
+        self.install()
+
+    def disable(self):
+        self.enabled = False
+        self.install()
+
+    def install(self):
+        # timed methods are replaced by their plain function while profiling is off, so they cost nothing
+        for owner, attribute, timed in self.instrumented:
+            setattr(owner, attribute, timed.wrapper if self.enabled else timed.func)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+
+    def record(self, kind, name, elapsed_ns):
+        with self.lock:
+            histogram = self.histograms.get((kind, name))
+            if histogram is None:
+                histogram = self.histograms[(kind, name)] = Histogram()
+            histogram.add(elapsed_ns)
+
+    def step_timer(self):
+        return StepTimer(self) if self.enabled else NullTimer()
+
+    def report(self, **run_info):
+        with self.lock:
+            histograms = dict(self.histograms)
+        report = {'run': run_info, 'phase': {}, 'function': {}}
+        for (kind, name), histogram in sorted(histograms.items()):
+            report[kind][name] = histogram.summary()
+            report[kind][name]['histogram_ns'] = [[*bucket_bounds(bucket), histogram.buckets[bucket]] for bucket in sorted(histogram.buckets)]
+        return report
+
+    def dump(self, report_file, **run_info):
+        """
+        Writes the report of everything recorded since the last reset.
+
+        Parameters:
+        report_file (str): A .csv file gets one summary row per phase and function, any other file the full JSON report.
+        run_info: Run metadata stored in the JSON report, e.g. steps and wall time.
+        """
+        report = self.report(**run_info)
+        directory = os.path.dirname(report_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if report_file.endswith('.csv'):
+            fieldnames = ['kind', 'name', 'count', 'total_ms', 'mean_us', 'min_us', 'p50_us', 'p90_us', 'p99_us', 'max_us']
+            with open(report_file, mode='w', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=fieldnames, extrasaction='ignore')
+                writer.writeheader()
+                for kind in ('phase', 'function'):
+                    for name, summary in report[kind].items():
+                        writer.writerow({'kind': kind, 'name': name, **summary})
+        else:
+            with open(report_file, mode='w') as file:
+                json.dump(report, file, indent=2)
+        return report
+
+
+profiler = Profiler()
+
+
+class timing_decorator:
+    # Times a method into the profiler under its qualified name. The class attribute is the plain function until
+    # profiler.enable() swaps in the timed wrapper; used on a plain function the flag is checked per call instead.
+
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record('function', self.name, time.perf_counter_ns() - start)
+        self.wrapper = wrapper
+        functools.update_wrapper(self, func)
+
+    def __set_name__(self, owner, attribute):
+        profiler.instrumented.append((owner, attribute, self))
+        setattr(owner, attribute, self.wrapper if profiler.enabled else self.func)
+
+    def __call__(self, *args, **kwargs):
+        if profiler.enabled:
+            return self.wrapper(*args, **kwargs)
+        return self.func(*args, **kwargs)
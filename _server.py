@@ -0,0 +1,132 @@
+"""
+Waypoint server of SUAVPy
+"""
+
+import asyncio
+import numpy as np
+import ujson as json
+
+
+class WaypointServer:
+    # asyncio TCP server for remote waypoints, any number of clients (e.g. one per ground station) at once.
+    # Messages are newline-delimited, either JSON objects
+    #     {"uav": 0, "waypoints": [[t, x, y, z, yaw], ...], "ack": true}
+    # or the legacy text form
+    #     0: [t, x, y, z, yaw]
+    # Whole trajectories are sent as a bulk header line followed by a packed little-endian float64 payload
+    #     {"type": "bulk", "uavs": [0, 1], "counts": [700, 300], "ack": true}\n<1000 x 5 float64>
+    # which is decoded without copying and applied as a single path update of all its UAVs.
+    # A message is acknowledged with {"ack": <waypoints>} when it asks for it or acks are on for all messages.
+
+    def __init__(self, sim, host='localhost', port=1024, acks=False, line_limit=2 ** 24, payload_limit=2 ** 30):
+        self.sim = sim
+        self.host = host
+        self.port = port
+        self.acks = acks
+        self.line_limit = line_limit
+        self.payload_limit = payload_limit
+        self.clients = {} # handler task -> stream writer of every open connection
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=self.line_limit)
+        print(f"Python server is waiting for connections on {self.host}:{self.port}...")
+        try:
+            while not self.sim.stop_flag:
+                await asyncio.sleep(0.1)
+        finally:
+            server.close()
+            for writer in self.clients.values(): # the handlers see the end of stream and return
+                writer.close()
+            await asyncio.gather(*self.clients, return_exceptions=True)
+            await server.wait_closed()
+            print("Server socket closed")
+
+    async def handle_client(self, reader, writer):
+        addr = writer.get_extra_info('peername')
+        print(f"Connected by {addr}")
+        self.clients[asyncio.current_task()] = writer
+        try:
+            while not self.sim.stop_flag:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    payload_size = self.bulk_payload_size(line)
+                except ValueError as e:
+                    writer.write(json.dumps({'error': str(e)}).encode() + b"\n")
+                    await writer.drain()
+                    raise
+                payload = None if payload_size is None else await reader.readexactly(payload_size)
+                # paths are rebuilt in a worker thread, a large update does not hold up the other clients
+                reply = await asyncio.get_running_loop().run_in_executor(None, self.handle_message, line, payload)
+                if reply is not None:
+                    writer.write(json.dumps(reply).encode() + b"\n")
+                    await writer.drain()
+        except (ConnectionResetError, ConnectionAbortedError, asyncio.LimitOverrunError, asyncio.IncompleteReadError, ValueError) as e:
+            print(f"Connection error: {e}")
+        finally:
+            del self.clients[asyncio.current_task()]
+            writer.close()
+            print(f"Connection closed {addr}")
+
+    def bulk_payload_size(self, line):
+        # Bytes that follow a bulk header line (0 for an empty bulk), None for any other message. A broken bulk
+        # header raises ValueError, the client gets the error and the connection is closed, since the next message
+        # boundary is unknown.
+        if not line.startswith(b'{') or b'"bulk"' not in line:
+            return None
+        header = json.loads(line)
+        if not isinstance(header, dict) or header.get('type') != 'bulk':
+            return None
+        try:
+            counts = [int(count) for count in header['counts']]
+            uav_count = len(header['uavs'])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Broken bulk header: {e!r}")
+        if len(counts) != uav_count or min(counts, default=0) < 0:
+            raise ValueError("Bulk header needs one non-negative count per UAV")
+        payload_size = sum(counts) * 5 * 8
+        if payload_size > self.payload_limit:
+            raise ValueError(f"Bulk payload of {payload_size} bytes is too large")
+        return payload_size
+
+    def handle_message(self, line, payload=None):
+        # a bad message is answered with an error, the connection stays open
+        try:
+            if payload is not None:
+                return self.handle_bulk(json.loads(line), payload)
+            uav_id, waypoints, ack = self.parse_message(line.decode())
+            if uav_id not in range(self.sim.num_UAVs):
+                raise ValueError(f"UAV {uav_id} does not exist")
+            self.sim.update_uav_waypoints(uav_id, waypoints)
+        except (ValueError, KeyError, TypeError, ArithmeticError) as e:
+            return {'error': str(e)}
+        return {'ack': len(waypoints)} if ack else None
+
+    def handle_bulk(self, header, payload):
+        uav_ids = [int(uav_id) for uav_id in header['uavs']]
+        for uav_id in uav_ids:
+            if uav_id not in range(self.sim.num_UAVs):
+                raise ValueError(f"UAV {uav_id} does not exist")
+
+        waypoints = np.frombuffer(payload, dtype='<f8').reshape(-1, 5) # a view on the received bytes
+        if not np.isfinite(waypoints).all(): # checked before any UAV is updated
+            raise ValueError("Waypoints must be finite numbers")
+        offsets = np.cumsum([0] + [int(count) for count in header['counts']])
+        self.sim.update_fleet_waypoints([(uav_id, waypoints[start:end]) for uav_id, start, end in zip(uav_ids, offsets[:-1], offsets[1:])])
+        return {'ack': len(waypoints)} if header.get('ack', self.acks) else None
+
+    def parse_message(self, message):
+        message = message.strip()
+        if message.startswith('{'):
+            data = json.loads(message)
+            waypoints = data['waypoints'] if 'waypoints' in data else [data['waypoint']]
+            return int(data['uav']), waypoints, data.get('ack', self.acks)
+
+        uav_id, details = message.split(":", 1)
+        return int(uav_id.strip()), [json.loads(details.strip())], self.acks
@@ -0,0 +1,101 @@
+"""
+Vehicle subscriptions of SUAVPy
+"""
+
+import numpy as np
+import traci
+
+
+VEHICLE_VARIABLES = [traci.constants.VAR_POSITION, traci.constants.VAR_SPEED]
+
+
+class DepartedSubscription:
+    # One subscription per departed vehicle, every vehicle of the network is returned each step
+
+    def __init__(self, backend, variables=VEHICLE_VARIABLES):
+        self.traci = backend
+        self.variables = variables
+
+    def prepare(self, trajectories, step):
+        pass
+
+    def restore(self):
+        # after loading a saved state: its vehicles departed before and are subscribed here
+        for veh_id in self.traci.vehicle.getIDList():
+            self.traci.vehicle.subscribe(veh_id, self.variables)
+
+    def results(self):
+        for veh_id in self.traci.simulation.getDepartedIDList():
+            self.traci.vehicle.subscribe(veh_id, self.variables)
+        return self.traci.vehicle.getAllSubscriptionResults()
+
+
+class SimulationContextSubscription:
+    # A single context subscription on the simulation domain, no round-trip per departing vehicle
+
+    def __init__(self, backend, network_range=1e7, variables=VEHICLE_VARIABLES):
+        self.traci = backend
+        self.network_range = network_range
+        self.variables = variables
+        self.subscribe()
+
+    def subscribe(self):
+        self.traci.simulation.subscribeContext("", traci.constants.CMD_GET_VEHICLE_VARIABLE, self.network_range, self.variables)
+
+    def restore(self):
+        self.subscribe()
+
+    def prepare(self, trajectories, step):
+        pass
+
+    def results(self):
+        return self.traci.simulation.getContextSubscriptionResults("") or {}
+
+
+class UAVContextSubscription:
+    # Context subscriptions around an invisible POI that follows the FOV centre of each UAV. The radius is the
+    # half diagonal of the FOV footprint, so only the vehicles that can be in view cross the socket.
+
+    def __init__(self, backend, calc, fov_degrees, num_UAVs, radius_step=10.0, variables=VEHICLE_VARIABLES):
+        self.traci = backend
+        self.variables = variables
+        self.calc = calc
+        self.fov_degrees = fov_degrees
+        self.radius_step = radius_step # radius is rounded up to avoid re-subscribing on every climb step
+        self.anchor_ids = [f"uav_anchor_{i}" for i in range(num_UAVs)]
+        self.anchor_positions = [None] * num_UAVs
+        self.anchor_radii = [None] * num_UAVs
+
+    def restore(self):
+        # the anchors are added by the first prepare, also after loading a saved state
+        pass
+
+    def prepare(self, trajectories, step):
+        # Move the anchors to the UAV poses of the coming step, TraCI is only called for anchors that changed
+        for uav_id, trajectory in enumerate(trajectories):
+            index = trajectory.step_index[step] if step < len(trajectory.step_index) else -1
+            if index < 0:
+                if self.anchor_positions[uav_id] is not None:
+                    continue
+                index = 0 # no sample yet, start at the first one
+            x, y, z = trajectory.positions[index]
+
+            fov_size = self.calc.fov_calculation(self.fov_degrees, z)
+            radius = np.ceil(0.5 * np.hypot(fov_size[0], fov_size[1]) / self.radius_step) * self.radius_step
+
+            if self.anchor_positions[uav_id] is None:
+                self.traci.poi.add(self.anchor_ids[uav_id], x, y, (0, 0, 0, 0), layer=-10)
+            elif self.anchor_positions[uav_id] != (x, y):
+                self.traci.poi.setPosition(self.anchor_ids[uav_id], x, y)
+            self.anchor_positions[uav_id] = (x, y)
+
+            if radius != self.anchor_radii[uav_id]:
+                self.traci.poi.subscribeContext(self.anchor_ids[uav_id], traci.constants.CMD_GET_VEHICLE_VARIABLE, radius, self.variables)
+                self.anchor_radii[uav_id] = radius
+
+    def results(self):
+        # the same vehicle can be near several UAVs, merging by id keeps one entry
+        subscribed_data = {}
+        for vehicles in self.traci.poi.getAllContextSubscriptionResults().values():
+            subscribed_data.update(vehicles)
+        return subscribed_data
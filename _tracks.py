@@ -0,0 +1,150 @@
+"""
+Vehicle tracks of SUAVPy
+"""
+
+import csv
+import os
+import numpy as np
+
+
+TRACK_COLUMNS = ['VehicleID', 'First_Seen', 'Last_Seen', 'Steps', 'UAV_IDs', 'Path_Length', 'Mean_Speed']
+TRACK_ARRAYS = ('first_step', 'last_step', 'steps', 'path_length', 'speed_sum', 'last_position', 'uav_bits')
+
+
+class TrackTable:
+    """
+    One track per vehicle instead of one row per vehicle, UAV and step.
+
+    The detections of all UAVs are merged every step, so a vehicle in several overlapping FOVs is one observation.
+    Tracks are rows of compact arrays found through a vehicle id -> row dict; the observing UAVs are a bit set per
+    row. A track that has not been seen for `timeout` seconds is written to '<name>_tracks.csv' and dropped (the
+    vehicle starts a new track if it comes back), the remaining tracks are written when the table is closed.
+
+    Parameters:
+    output_file (str): Output file of the run, the track file is named after it.
+    num_UAVs (int): Number of UAVs.
+    step_length (float): Simulation step length in seconds.
+    timeout (float): Seconds without an observation that close a track, 0 keeps all tracks until the end.
+    resume_state (dict): State of a checkpointed run (see checkpoint) to continue from.
+    """
+
+    def __init__(self, output_file, num_UAVs, step_length, timeout=60.0, capacity=1024, resume_state=None):
+        self.step_length = step_length
+        self.timeout_steps = int(round(timeout / step_length)) if timeout > 0 else 0
+        self.rows = {} # vehicle id -> row
+        self.vehicle_ids = []
+        self.allocate(capacity, (num_UAVs + 7) // 8)
+        self.tracks_written = 0
+
+        track_file = os.path.splitext(output_file)[0] + '_tracks.csv'
+        if resume_state is None:
+            self.file = open(track_file, mode='w', newline='')
+            self.writer = csv.writer(self.file, delimiter=',')
+            self.writer.writerow(TRACK_COLUMNS)
+        else:
+            self.file = open(track_file, mode='r+', newline='')
+            self.file.truncate(resume_state['offset'])
+            self.file.seek(resume_state['offset'])
+            self.writer = csv.writer(self.file, delimiter=',')
+            self.vehicle_ids = list(resume_state['vehicle_ids'])
+            self.rows = {vehicle_id: row for row, vehicle_id in enumerate(self.vehicle_ids)}
+            self.tracks_written = resume_state['tracks_written']
+            self.grow(len(self.vehicle_ids))
+            for name in TRACK_ARRAYS:
+                getattr(self, name)[:len(self.vehicle_ids)] = resume_state[name]
+
+    def allocate(self, capacity, uav_bytes):
+        self.first_step = np.zeros(capacity, dtype=np.int64)
+        self.last_step = np.zeros(capacity, dtype=np.int64)
+        self.steps = np.zeros(capacity, dtype=np.int64)
+        self.path_length = np.zeros(capacity)
+        self.speed_sum = np.zeros(capacity)
+        self.last_position = np.zeros((capacity, 2))
+        self.uav_bits = np.zeros((capacity, uav_bytes), dtype=np.uint8)
+
+    def grow(self, size):
+        capacity = len(self.first_step)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in TRACK_ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, step, detecting_ids, vehicles_in_fovs, vehicle_grid):
+        # vehicles_in_fovs: vehicle indices of the grid per detecting UAV
+        counts = np.array([len(in_view) for in_view in vehicles_in_fovs], dtype=np.int64)
+        if counts.sum() > 0:
+            vehicles = np.concatenate(vehicles_in_fovs)
+            uavs = np.repeat(np.asarray(detecting_ids, dtype=np.int64), counts)
+            seen, observation = np.unique(vehicles, return_inverse=True) # one observation per vehicle and step
+
+            new_tracks = len(self.vehicle_ids)
+            rows = np.array([self.row(vehicle_grid.vehicle_ids[i]) for i in seen.tolist()], dtype=np.int64)
+            new = rows >= new_tracks
+            positions = vehicle_grid.positions[seen]
+
+            # the path only grows between consecutive observations, a gap is not guessed
+            continued = ~new & (self.last_step[rows] == step - 1)
+            self.path_length[rows[continued]] += np.hypot(*(positions[continued] - self.last_position[rows[continued]]).T)
+            self.first_step[rows[new]] = step
+            self.last_step[rows] = step
+            self.steps[rows] += 1
+            self.speed_sum[rows] += vehicle_grid.speeds[seen]
+            self.last_position[rows] = positions
+            np.bitwise_or.at(self.uav_bits, (rows[observation], uavs // 8), (1 << (uavs % 8)).astype(np.uint8))
+
+        if self.timeout_steps and step % self.timeout_steps == 0:
+            self.write(self.last_step[:len(self.vehicle_ids)] < step - self.timeout_steps)
+
+    def row(self, vehicle_id):
+        row = self.rows.get(vehicle_id)
+        if row is None:
+            row = self.rows[vehicle_id] = len(self.vehicle_ids)
+            self.vehicle_ids.append(vehicle_id)
+            self.grow(row + 1)
+        return row
+
+    def write(self, closed):
+        # writes the tracks marked in `closed` and compacts the table to the open ones
+        rows = np.flatnonzero(closed)
+        if len(rows) == 0:
+            return
+        uav_ids = np.unpackbits(self.uav_bits[rows], axis=1, bitorder='little')
+        self.writer.writerows(zip([self.vehicle_ids[row] for row in rows.tolist()],
+                                  (self.first_step[rows] * self.step_length).tolist(),
+                                  (self.last_step[rows] * self.step_length).tolist(),
+                                  self.steps[rows].tolist(),
+                                  [' '.join(map(str, np.flatnonzero(bits).tolist())) for bits in uav_ids],
+                                  self.path_length[rows].tolist(),
+                                  (self.speed_sum[rows] / self.steps[rows]).tolist()))
+        self.tracks_written += len(rows)
+
+        kept = np.flatnonzero(~closed)
+        for name in TRACK_ARRAYS:
+            values = getattr(self, name)
+            values[:len(kept)] = values[kept]
+            values[len(kept):] = 0
+        self.vehicle_ids = [self.vehicle_ids[row] for row in kept.tolist()]
+        self.rows = {vehicle_id: row for row, vehicle_id in enumerate(self.vehicle_ids)}
+
+    def checkpoint(self):
+        # the open tracks and the offset of the track file, enough to continue the table in a new process
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        state = {name: getattr(self, name)[:len(self.vehicle_ids)].copy() for name in TRACK_ARRAYS}
+        state.update(vehicle_ids=list(self.vehicle_ids), tracks_written=self.tracks_written, offset=self.file.tell())
+        return state
+
+    def close(self):
+        self.write(np.ones(len(self.vehicle_ids), dtype=bool))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
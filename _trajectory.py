@@ -0,0 +1,189 @@
+"""
+Trajectory engine of SUAVPy
+"""
+
+import numpy as np
+
+
+class Trajectory:
+    # Interpolated path of one UAV. It is never modified after creation, updates build a new object
+    # so the simulation loop always sees positions, yaw angles and step lookup that belong together.
+    __slots__ = ('positions', 'steps', 'yaw_angles', 'segment_starts', 'step_index')
+
+    def __init__(self, positions, steps, yaw_angles, segment_starts, step_index):
+        self.positions = positions # (N, 3)
+        self.steps = steps # (N,) simulation step of every sample
+        self.yaw_angles = yaw_angles # (N,)
+        self.segment_starts = segment_starts # first sample of every waypoint segment, the last one is the final hover
+        self.step_index = step_index # (total steps + 1,) step -> sample, -1 if there is no sample
+        for array in (positions, steps, yaw_angles, segment_starts, step_index):
+            array.flags.writeable = False
+
+
+class TrajectorySnapshot:
+    # Versioned, immutable set of the trajectories of all UAVs. A writer builds a new snapshot and publishes it
+    # with a single reference swap, the simulation loop takes one at the start of every step and uses it for the
+    # whole step, so it never sees a mix of old and new paths and never waits for a writer.
+    __slots__ = ('version', 'trajectories')
+
+    def __init__(self, trajectories, version=0):
+        self.version = version
+        self.trajectories = tuple(trajectories)
+
+    def replace(self, uav_id, trajectory):
+        return self.replace_many({uav_id: trajectory})
+
+    def replace_many(self, trajectories):
+        # one new version with the given paths, uav id -> trajectory
+        replaced = list(self.trajectories)
+        for uav_id, trajectory in trajectories.items():
+            replaced[uav_id] = trajectory
+        return TrajectorySnapshot(replaced, self.version + 1)
+
+    def __len__(self):
+        return len(self.trajectories)
+
+    def __iter__(self):
+        return iter(self.trajectories)
+
+    def __getitem__(self, uav_id):
+        return self.trajectories[uav_id]
+
+
+class TrajectoryEngine:
+
+    def __init__(self, calc, uav_mode, movement, simulation_step_length, yaw_speed, total_simulation_steps):
+        self.calc = calc
+        self.uav_mode = uav_mode
+        self.movement = movement
+        self.simulation_step_length = simulation_step_length
+        self.total_simulation_steps = total_simulation_steps
+        self.spin_step = yaw_speed * simulation_step_length # yaw increment per step in Spinning mode
+
+    def waypoints(self, data_points):
+        # all samples are float64, so integer waypoint values of config.json are written as e.g. 0.0 and 75.0
+        points = np.asarray(data_points, dtype=np.float64).reshape(-1, 5)
+        positions = points[:, 1:4]
+        yaw_angles = points[:, 4]
+        times = (points[:, 0] / self.simulation_step_length).astype(np.int64) # truncates like int()
+        return positions, yaw_angles, times
+
+    def build(self, data_points):
+        return self.rebuild(None, data_points, 0)
+
+    def rebuild(self, trajectory, data_points, first_waypoint):
+        # Re-interpolates the path from the segment that ends at `first_waypoint` onwards and splices it
+        # after the unchanged prefix of `trajectory`. A new Trajectory is returned, the old one is not modified.
+        positions, yaw_angles, times = self.waypoints(data_points)
+
+        if self.movement == 'Discrete':
+            # when server or script is on we do not follow the simple dynamics (rotate-hover-rotate)
+            return Trajectory(np.ascontiguousarray(positions), times, yaw_angles.copy(), np.arange(len(times)), self.step_index(times))
+
+        first_segment = max(first_waypoint - 1, 0)
+        if trajectory is None or first_segment == 0 or first_segment >= len(trajectory.segment_starts):
+            trajectory = None
+            first_segment = 0
+            kept_samples = 0
+        else:
+            kept_samples = int(trajectory.segment_starts[first_segment])
+
+        position_blocks = [] if trajectory is None else [trajectory.positions[:kept_samples]]
+        yaw_blocks = [] if trajectory is None else [trajectory.yaw_angles[:kept_samples]]
+        segment_starts = [] if trajectory is None else list(trajectory.segment_starts[:first_segment])
+        total_steps = int(times[0]) + kept_samples # start of counting
+
+        for i in range(first_segment, len(positions) - 1):
+            segment_starts.append(total_steps - times[0])
+            segment_positions, segment_yaws = self.segment(positions[i], positions[i + 1], yaw_angles[i], yaw_angles[i + 1], int(times[i + 1]) - total_steps)
+            position_blocks.append(segment_positions)
+            yaw_blocks.append(segment_yaws)
+            total_steps += len(segment_yaws)
+
+        # hovering at the final position until the end of simulation
+        segment_starts.append(total_steps - times[0])
+        final_positions, final_yaws = self.hover(positions[-1], yaw_angles[-1], self.total_simulation_steps - total_steps)
+        position_blocks.append(final_positions)
+        yaw_blocks.append(final_yaws)
+
+        uav_positions = np.concatenate(position_blocks)
+        uav_yaw_angles = np.concatenate(yaw_blocks)
+        step_times = np.arange(times[0], times[0] + len(uav_yaw_angles), dtype=np.int64)
+
+        if trajectory is None:
+            step_index = self.step_index(step_times)
+        else:
+            # the step times are consecutive, so only the lookup entries of the new suffix change
+            step_index = trajectory.step_index.copy()
+            step_index[min(int(times[0]) + kept_samples, len(step_index)):] = -1
+            suffix_steps = step_times[kept_samples:]
+            in_range = (suffix_steps >= 0) & (suffix_steps <= self.total_simulation_steps)
+            step_index[suffix_steps[in_range]] = np.arange(kept_samples, len(step_times))[in_range]
+
+        return Trajectory(uav_positions, step_times, uav_yaw_angles, np.asarray(segment_starts, dtype=np.int64), step_index)
+
+    def step_index(self, times):
+        # dense step -> sample lookup for the simulation loop (-1 when the UAV has no sample at that step)
+        step_index = np.full(self.total_simulation_steps + 1, -1, dtype=np.int32)
+        unique_times, first_index = np.unique(times, return_index=True) # first occurrence, same as times.index(step)
+        in_range = (unique_times >= 0) & (unique_times <= self.total_simulation_steps)
+        step_index[unique_times[in_range]] = first_index[in_range]
+        return step_index
+
+    def hover(self, position, yaw_angle, hover_steps):
+        hover_steps = max(hover_steps, 0)
+        hover_positions = np.broadcast_to(position, (hover_steps, 3))
+        if self.uav_mode == 'Spinning':
+            # cumsum adds the increments one at a time, exactly like the step-by-step accumulation
+            hover_yaws = np.cumsum(np.concatenate(([yaw_angle], np.full(hover_steps, self.spin_step))))[1:]
+        else:
+            hover_yaws = np.full(hover_steps, yaw_angle)
+        return hover_positions, hover_yaws
+
+    def move(self, init_pos, next_pos, move_steps):
+        fractions = np.arange(1, move_steps + 1)[:, None]
+        return init_pos + (next_pos - init_pos) * fractions / move_steps
+
+    def rotate(self, start_yaw, end_yaw, rotate_steps):
+        fractions = np.arange(1, rotate_steps + 1)
+        return start_yaw + (end_yaw - start_yaw) * fractions / rotate_steps
+
+    def segment(self, init_pos, next_pos, current_yaw_angle, target_yaw_angle, hover_steps):
+        # hover until the next waypoint time, then rotate-move-rotate towards it
+        move_yaw_angle = self.calc.calculate_yaw_angle(init_pos, next_pos) # angle between the two 'move' positions
+        move_steps = self.calc.calculate_move_steps(init_pos, next_pos) # steps needed to move from A to B
+        rotate_to_move_steps = self.calc.calculate_rotate_steps(move_yaw_angle - current_yaw_angle) # steps needed to rotate before start moving
+        rotate_to_target_steps = self.calc.calculate_rotate_steps(target_yaw_angle - move_yaw_angle) # steps needed to rotate after reaching position but not yaw angle
+
+        hover_positions, hover_yaws = self.hover(init_pos, current_yaw_angle, hover_steps)
+        position_blocks = [hover_positions]
+        yaw_blocks = [hover_yaws]
+
+        if self.uav_mode == 'Spinning':
+            if len(hover_yaws):
+                current_yaw_angle = hover_yaws[-1]
+            current_yaw_angle = current_yaw_angle % 360 # fast spinning fix.
+            rotate_to_move_steps = self.calc.calculate_rotate_steps(move_yaw_angle - current_yaw_angle)
+
+        if np.array_equal(init_pos[:2], next_pos[:2]):
+            # No horizontal movement, only change in height or yaw
+            rotate_to_target_steps = self.calc.calculate_rotate_steps(target_yaw_angle - current_yaw_angle)
+
+            # Move to the new height, no yaw change
+            position_blocks.append(self.move(init_pos, next_pos, move_steps))
+            yaw_blocks.append(np.full(move_steps, current_yaw_angle))
+
+            position_blocks.append(np.broadcast_to(next_pos, (rotate_to_target_steps, 3)))
+            yaw_blocks.append(self.rotate(current_yaw_angle, target_yaw_angle, rotate_to_target_steps))
+        else:
+            position_blocks.append(np.broadcast_to(init_pos, (rotate_to_move_steps, 3)))
+            yaw_blocks.append(self.rotate(current_yaw_angle, move_yaw_angle, rotate_to_move_steps))
+
+            position_blocks.append(self.move(init_pos, next_pos, move_steps))
+            yaw_blocks.append(np.full(move_steps, move_yaw_angle))
+
+            if self.uav_mode != 'Spinning':
+                position_blocks.append(np.broadcast_to(next_pos, (rotate_to_target_steps, 3)))
+                yaw_blocks.append(self.rotate(move_yaw_angle, target_yaw_angle, rotate_to_target_steps))
+
+        return np.concatenate(position_blocks), np.concatenate(yaw_blocks)
@@ -1,161 +1,260 @@
-import numpy as np
-import traci
-from functools import wraps
-import time
-
-
-timing_data_utils = {}
-call_counts_utils = {}
-
-def timing_decorator(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        
-        elapsed_time = end_time - start_time
-        if func.__name__ not in timing_data_utils:
-            timing_data_utils[func.__name__] = 0
-            call_counts_utils[func.__name__] = 0
-        timing_data_utils[func.__name__] += elapsed_time
-        call_counts_utils[func.__name__] += 1
-        
-        return result
-
-    return wrapper
-
-class Calculations:
-
-    def __init__(self, uav_speed, simulation_step_length, yaw_speed):
-        self.uav_speed = uav_speed
-        self.simulation_step_length = simulation_step_length
-        self.yaw_speed = yaw_speed
-        
-    @timing_decorator    
-    def calculate_yaw_angle(self, start, end): # We ignore the pitch angle here.
-        direction = np.degrees(np.arctan2(end[1] - start[1], end[0] - start[0]))
-        return 90 - direction
-    
-    @timing_decorator
-    def calculate_move_steps(self, start_pos, end_pos):
-        distance = np.linalg.norm(end_pos - start_pos)
-        return int(distance / (self.uav_speed * self.simulation_step_length))
-    
-    # @timing_decorator
-    # def calculate_rotate_steps_(self, yaw_difference):
-    #     yaw_difference = (yaw_difference + 360) % 360  # to choose the correct rotation angle
-    #     yaw_difference = abs(yaw_difference)
-    #     return int((yaw_difference / (self.yaw_speed * self.simulation_step_length)))  
-    
-    @timing_decorator
-    def calculate_rotate_steps(self, yaw_difference):
-        # Normalize the yaw difference to the minimal angle [0, 180]
-        yaw_difference = (yaw_difference + 360) % 360
-        if yaw_difference > 180:
-            yaw_difference = 360 - yaw_difference
-        step_angle = self.yaw_speed * self.simulation_step_length
-        steps = int(np.ceil(yaw_difference / step_angle))
-        return steps if steps > 0 else 1
-    
-    @timing_decorator
-    def calculate_fov_corners(self, uav_position, fov_size, yaw_angle):
-        uav_x, uav_y, _ = uav_position
-        L1, L2 = fov_size
-
-        corners = np.array([
-            [uav_x - L1 * 0.5 , uav_y - L2 * 0.5],
-            [uav_x + L1 * 0.5, uav_y - L2 * 0.5],
-            [uav_x + L1 * 0.5, uav_y + L2 * 0.5],
-            [uav_x - L1 * 0.5, uav_y + L2 * 0.5]
-        ])
-
-        theta = np.radians(yaw_angle)
-        rotation_matrix = np.array([
-            [np.cos(theta), -np.sin(theta)],
-            [np.sin(theta), np.cos(theta)]
-        ])
-
-        rotated_corners = np.dot(corners - np.array([uav_x, uav_y]), rotation_matrix) + np.array([uav_x, uav_y])
-
-        return rotated_corners.tolist()
-    
-    @timing_decorator
-    def fov_calculation(self, fov_degrees, height):
-        a, b = fov_degrees
-        x = 2 * height * np.tan(np.radians(a * 0.5))
-        y = 2 * height * np.tan(np.radians(b * 0.5))
-        return np.array([x, y]) 
-    
-    @timing_decorator
-    def get_vehicles_in_fov(self, subscribed_data, uav_position, fov_size, yaw_angle, return_info=('positions', 'speeds')):
-        vehicles_in_view = []
-        positions_in_view = []
-        speeds_in_view = []
-
-        fov_corners = self.calculate_fov_corners(uav_position, fov_size, yaw_angle) 
-        fov_corners = np.array(fov_corners)
-
-        min_x, max_x = np.min(fov_corners[:, 0]), np.max(fov_corners[:, 0])
-        min_y, max_y = np.min(fov_corners[:, 1]), np.max(fov_corners[:, 1]) 
-
-        for vehicle_id, data in subscribed_data.items():
-            position = data[traci.constants.VAR_POSITION]
-            if min_x <= position[0] <= max_x and min_y <= position[1] <= max_y:
-                vehicles_in_view.append(vehicle_id)
-                if 'positions' in return_info:
-                    positions_in_view.append(position)
-                if 'speeds' in return_info:
-                    speeds_in_view.append(data[traci.constants.VAR_SPEED])
-
-        result = {'vehicle_ids': vehicles_in_view}
-        if 'positions' in return_info:
-            result['positions'] = positions_in_view
-        if 'speeds' in return_info:
-            result['speeds'] = speeds_in_view
-
-        return result
-     
-    @timing_decorator
-    def update_fov_polygon(self,uav_position, fov_size, yaw_angle, polygon_id, border_polygon_id):
-        points = self.calculate_fov_corners(uav_position, fov_size, yaw_angle)
-        border_points = points + [points[0]]
-        traci.polygon.setShape(polygon_id, points)
-        traci.polygon.setShape(border_polygon_id, border_points)
-        
-        
-    @timing_decorator
-    def add_fov_polygon(self,uav_position, fov_size, yaw_angle, polygon_id, border_polygon_id):
-        points = self.calculate_fov_corners(uav_position, fov_size, yaw_angle)
-        border_points = points + [points[0]]
-        traci.polygon.add(polygon_id, points, (160, 160, 255, 128), layer=-1, fill=True)  
-        traci.polygon.add(border_polygon_id, border_points, (200, 200, 255, 255), layer=0, fill=False, lineWidth=1)  
-          
-    @timing_decorator  
-    def remove_fov_polygon(self, polygon_id, border_polygon_id):
-        try:
-            traci.polygon.remove(polygon_id)
-            traci.polygon.remove(border_polygon_id)
-        except traci.TraCIException: # as e:
-            pass #logger.error(f"Error removing polygons: {e}")
-    
-    def remove_poi(self, polygon_id):
-        try:
-            traci.poi.remove(polygon_id)
-        except traci.TraCIException: #as e:
-            pass #logger.error(f"Error removing POI: {e}")
-
-    @timing_decorator
-    def add_poi(self, poi_id, position, yaw_angle, icon_path):
-        x, y, _ = position
-        traci.poi.add(poi_id, x, y, (255, 255, 255, 255), layer=999, angle=yaw_angle, imgFile=icon_path)
-        
-    @timing_decorator
-    def update_poi(self, poi_id, position, yaw_angle):
-        x, y, z = position        
-        traci.poi.setPosition(poi_id, x, y)
-        traci.poi.setAngle(poi_id, yaw_angle)
-        size = z * 0.25
-        traci.poi.setHeight(poi_id, size)
-        traci.poi.setWidth(poi_id, size)
-
+import numpy as np
+import traci
+from collections import OrderedDict
+from _profiling import timing_decorator # methods are timed only while the profiler is enabled
+
+
+def backend_errors(backend):
+    # (TraCIException, FatalTraCIError) raised by a backend: libsumo has its own classes, a TraCI connection and
+    # the stand-in raise those of the traci module
+    if getattr(backend, '__name__', None) == 'libsumo':
+        error = backend.TraCIException
+        return error, getattr(backend, 'FatalTraCIError', error)
+    return traci.TraCIException, traci.exceptions.FatalTraCIError
+
+
+class VehicleGrid:
+    # Uniform grid over the vehicle positions of one simulation step. It is built once per step and
+    # shared by the FOV queries of all UAVs, so each query only looks at the vehicles of the cells it overlaps.
+
+    def __init__(self, subscribed_data, cell_size):
+        self.cell_size = cell_size
+        self.vehicle_ids = list(subscribed_data)
+        vehicle_data = subscribed_data.values()
+        self.positions = np.array([data[traci.constants.VAR_POSITION] for data in vehicle_data], dtype=np.float64).reshape(-1, 2)
+        self.speeds = np.array([data[traci.constants.VAR_SPEED] for data in vehicle_data], dtype=np.float64)
+
+        cells = np.floor(self.positions / cell_size).astype(np.int64)
+        if len(cells):
+            self.origin = cells.min(axis=0)
+            self.columns, self.rows = cells.max(axis=0) - self.origin + 1
+        else:
+            self.origin = np.zeros(2, dtype=np.int64)
+            self.columns, self.rows = 0, 0
+
+        # vehicles sorted by cell, the cells of one grid column are contiguous
+        cell_keys = (cells[:, 0] - self.origin[0]) * self.rows + (cells[:, 1] - self.origin[1])
+        self.order = np.argsort(cell_keys, kind='stable')
+        self.sorted_keys = cell_keys[self.order]
+
+    def __len__(self):
+        return len(self.vehicle_ids)
+
+    def candidates(self, min_x, max_x, min_y, max_y):
+        # indices of the vehicles in the cells overlapping the box, in subscription order
+        first_column, first_row = np.floor(np.array([min_x, min_y]) / self.cell_size).astype(np.int64) - self.origin
+        last_column, last_row = np.floor(np.array([max_x, max_y]) / self.cell_size).astype(np.int64) - self.origin
+        first_column, first_row = max(first_column, 0), max(first_row, 0)
+        last_column, last_row = min(last_column, self.columns - 1), min(last_row, self.rows - 1)
+        if first_column > last_column or first_row > last_row:
+            return np.empty(0, dtype=np.int64)
+
+        column_keys = np.arange(first_column, last_column + 1) * self.rows
+        starts = np.searchsorted(self.sorted_keys, column_keys + first_row, side='left')
+        ends = np.searchsorted(self.sorted_keys, column_keys + last_row, side='right')
+        return np.sort(np.concatenate([self.order[start:end] for start, end in zip(starts, ends)]))
+
+
+class Calculations:
+
+    def __init__(self, uav_speed, simulation_step_length, yaw_speed, grid_cell_size=100.0, footprint_cache_size=4096):
+        self.uav_speed = uav_speed
+        self.simulation_step_length = simulation_step_length
+        self.yaw_speed = yaw_speed
+        self.grid_cell_size = grid_cell_size
+        self.traci = traci # replaced by the running backend (TraCI connection or libsumo) in start_sumo
+        self.traci_error = traci.TraCIException # and its exception class
+        
+        # FOV geometry per distinct altitude and yaw, a hovering UAV computes its footprint only once
+        self.footprint_cache_size = footprint_cache_size
+        self.fov_sizes = OrderedDict() # (fov degrees, height) -> FOV size
+        self.fov_offsets = OrderedDict() # (FOV size, yaw) -> (4, 2) corners relative to the UAV
+    
+    def cached(self, cache, key, compute):
+        # least recently used entries are evicted beyond footprint_cache_size
+        value = cache.get(key)
+        if value is None:
+            value = cache[key] = compute()
+            if len(cache) > self.footprint_cache_size:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return value
+        
+    @timing_decorator    
+    def calculate_yaw_angle(self, start, end): # We ignore the pitch angle here.
+        direction = np.degrees(np.arctan2(end[1] - start[1], end[0] - start[0]))
+        return 90 - direction
+    
+    @timing_decorator
+    def calculate_move_steps(self, start_pos, end_pos):
+        distance = np.linalg.norm(end_pos - start_pos)
+        return int(distance / (self.uav_speed * self.simulation_step_length))
+    
+    # @timing_decorator
+    # def calculate_rotate_steps_(self, yaw_difference):
+    #     yaw_difference = (yaw_difference + 360) % 360  # to choose the correct rotation angle
+    #     yaw_difference = abs(yaw_difference)
+    #     return int((yaw_difference / (self.yaw_speed * self.simulation_step_length)))  
+    
+    @timing_decorator
+    def calculate_rotate_steps(self, yaw_difference):
+        # Normalize the yaw difference to the minimal angle [0, 180]
+        yaw_difference = (yaw_difference + 360) % 360
+        if yaw_difference > 180:
+            yaw_difference = 360 - yaw_difference
+        step_angle = self.yaw_speed * self.simulation_step_length
+        steps = int(np.ceil(yaw_difference / step_angle))
+        return steps if steps > 0 else 1
+    
+    @timing_decorator
+    def calculate_fov_corners(self, uav_position, fov_size, yaw_angle):
+        uav_x, uav_y, _ = uav_position
+        L1, L2 = fov_size
+        offsets = self.cached(self.fov_offsets, (L1, L2, yaw_angle), lambda: self.rotated_offsets(L1, L2, yaw_angle))
+        return (offsets + np.array([uav_x, uav_y])).tolist()
+    
+    @timing_decorator
+    def calculate_fleet_fov_corners(self, uav_positions, fov_degrees, yaw_angles):
+        # (K, 4, 2) FOV corners of K UAVs from the footprint cache, same values as calculate_fov_corners
+        if len(yaw_angles) == 0:
+            return np.empty((0, 4, 2))
+        offsets = []
+        for height, yaw_angle in zip(uav_positions[:, 2].tolist(), yaw_angles.tolist()):
+            L1, L2 = self.fov_calculation(fov_degrees, height)
+            offsets.append(self.cached(self.fov_offsets, (L1, L2, yaw_angle), lambda: self.rotated_offsets(L1, L2, yaw_angle)))
+        return np.stack(offsets) + uav_positions[:, None, :2]
+    
+    def rotated_offsets(self, L1, L2, yaw_angle):
+        corners = np.array([
+            [-L1 * 0.5, -L2 * 0.5],
+            [L1 * 0.5, -L2 * 0.5],
+            [L1 * 0.5, L2 * 0.5],
+            [-L1 * 0.5, L2 * 0.5]
+        ])
+
+        theta = np.radians(yaw_angle)
+        rotation_matrix = np.array([
+            [np.cos(theta), -np.sin(theta)],
+            [np.sin(theta), np.cos(theta)]
+        ])
+
+        return np.dot(corners, rotation_matrix)
+    
+    @timing_decorator
+    def fov_calculation(self, fov_degrees, height):
+        a, b = fov_degrees
+        return self.cached(self.fov_sizes, (a, b, height), lambda: self.fov_size(a, b, height))
+    
+    def fov_size(self, a, b, height):
+        x = 2 * height * np.tan(np.radians(a * 0.5))
+        y = 2 * height * np.tan(np.radians(b * 0.5))
+        size = np.array([x, y])
+        size.flags.writeable = False # shared by every caller of the same height
+        return size
+    
+    @timing_decorator
+    def build_vehicle_grid(self, subscribed_data):
+        return VehicleGrid(subscribed_data, self.grid_cell_size)
+    
+    @timing_decorator
+    def vehicles_in_fovs(self, fov_corners, positions):
+        # Exact point in rotated rectangle test as one broadcast: (U, 4, 2) corners x (V, 2) positions -> (U, V) visibility
+        origin = fov_corners[:, 0, :]
+        edge_u = fov_corners[:, 1, :] - origin
+        edge_v = fov_corners[:, 3, :] - origin
+        offsets = positions[None, :, :] - origin[:, None, :]
+        along_u = np.einsum('uvk,uk->uv', offsets, edge_u)
+        along_v = np.einsum('uvk,uk->uv', offsets, edge_v)
+        length_u = np.einsum('uk,uk->u', edge_u, edge_u)[:, None]
+        length_v = np.einsum('uk,uk->u', edge_v, edge_v)[:, None]
+        has_area = (length_u > 0) & (length_v > 0) # a UAV on the ground has a zero size footprint and sees nothing
+        return has_area & (along_u >= 0) & (along_u <= length_u) & (along_v >= 0) & (along_v <= length_v)
+
+    def vehicles_in_fov_pairs(self, fov_corners, positions):
+        # The test of vehicles_in_fovs for N (FOV, vehicle) pairs: (N, 4, 2) corners x (N, 2) positions -> (N,) visibility
+        origin = fov_corners[:, 0, :]
+        edge_u = fov_corners[:, 1, :] - origin
+        edge_v = fov_corners[:, 3, :] - origin
+        offsets = positions - origin
+        along_u = np.einsum('vk,vk->v', offsets, edge_u)
+        along_v = np.einsum('vk,vk->v', offsets, edge_v)
+        length_u = np.einsum('vk,vk->v', edge_u, edge_u)
+        length_v = np.einsum('vk,vk->v', edge_v, edge_v)
+        has_area = (length_u > 0) & (length_v > 0)
+        return has_area & (along_u >= 0) & (along_u <= length_u) & (along_v >= 0) & (along_v <= length_v)
+
+    @timing_decorator
+    def get_vehicles_in_fovs(self, vehicle_grid, fov_corners):
+        # Vehicle indices (subscription order) inside each of the (U, 4, 2) FOV corners
+        fov_corners = np.asarray(fov_corners, dtype=np.float64).reshape(-1, 4, 2)
+        if len(fov_corners) == 0:
+            return []
+
+        # the grid narrows the vehicles down to the cells around any FOV, the exact test runs on those only
+        min_corners, max_corners = fov_corners.min(axis=1), fov_corners.max(axis=1)
+        candidates = np.unique(np.concatenate([vehicle_grid.candidates(min_x, max_x, min_y, max_y) for (min_x, min_y), (max_x, max_y) in zip(min_corners, max_corners)]))
+        visible = self.vehicles_in_fovs(fov_corners, vehicle_grid.positions[candidates])
+
+        fov_rows, columns = np.nonzero(visible)
+        return np.split(candidates[columns], np.searchsorted(fov_rows, np.arange(1, len(fov_corners))))
+
+    @timing_decorator
+    def get_vehicles_in_fov(self, vehicle_grid, uav_position, fov_size, yaw_angle, return_info=('positions', 'speeds')):
+        if not isinstance(vehicle_grid, VehicleGrid): # raw subscription results
+            vehicle_grid = self.build_vehicle_grid(vehicle_grid)
+
+        fov_corners = self.calculate_fov_corners(uav_position, fov_size, yaw_angle) 
+        in_view = self.get_vehicles_in_fovs(vehicle_grid, [fov_corners])[0]
+
+        result = {'vehicle_ids': [vehicle_grid.vehicle_ids[i] for i in in_view]}
+        if 'positions' in return_info:
+            result['positions'] = vehicle_grid.positions[in_view].tolist()
+        if 'speeds' in return_info:
+            result['speeds'] = vehicle_grid.speeds[in_view].tolist()
+
+        return result
+     
+    @timing_decorator
+    def update_fov_polygon(self,uav_position, fov_size, yaw_angle, polygon_id, border_polygon_id):
+        points = self.calculate_fov_corners(uav_position, fov_size, yaw_angle)
+        border_points = points + [points[0]]
+        self.traci.polygon.setShape(polygon_id, points)
+        self.traci.polygon.setShape(border_polygon_id, border_points)
+        
+        
+    @timing_decorator
+    def add_fov_polygon(self,uav_position, fov_size, yaw_angle, polygon_id, border_polygon_id):
+        points = self.calculate_fov_corners(uav_position, fov_size, yaw_angle)
+        border_points = points + [points[0]]
+        self.traci.polygon.add(polygon_id, points, (160, 160, 255, 128), layer=-1, fill=True)  
+        self.traci.polygon.add(border_polygon_id, border_points, (200, 200, 255, 255), layer=0, fill=False, lineWidth=1)  
+          
+    @timing_decorator  
+    def remove_fov_polygon(self, polygon_id, border_polygon_id):
+        try:
+            self.traci.polygon.remove(polygon_id)
+            self.traci.polygon.remove(border_polygon_id)
+        except self.traci_error: # as e:
+            pass #logger.error(f"Error removing polygons: {e}")
+    
+    def remove_poi(self, polygon_id):
+        try:
+            self.traci.poi.remove(polygon_id)
+        except self.traci_error: #as e:
+            pass #logger.error(f"Error removing POI: {e}")
+
+    @timing_decorator
+    def add_poi(self, poi_id, position, yaw_angle, icon_path):
+        x, y, _ = position
+        self.traci.poi.add(poi_id, x, y, (255, 255, 255, 255), layer=999, angle=yaw_angle, imgFile=icon_path)
+        
+    @timing_decorator
+    def update_poi(self, poi_id, position, yaw_angle):
+        x, y, z = position        
+        self.traci.poi.setPosition(poi_id, x, y)
+        self.traci.poi.setAngle(poi_id, yaw_angle)
+        size = z * 0.25
+        self.traci.poi.setHeight(poi_id, size)
+        self.traci.poi.setWidth(poi_id, size)
+
@@ -0,0 +1,102 @@
+"""
+Lane visibility index of SUAVPy
+"""
+
+import numpy as np
+import traci
+from collections import OrderedDict
+from itertools import repeat
+from _profiling import timing_decorator
+
+
+class LaneVisibility:
+    """
+    Lanes seen by each FOV footprint, so vehicles are matched to UAVs by their lane instead of their position.
+
+    For a footprint every lane is either fully covered (all of its shape lies inside the footprint shrunk by
+    `margin`), partially covered (its bounding box touches the footprint grown by `margin`) or not visible. A
+    vehicle on a fully covered lane is in view, a vehicle on a partially covered lane gets the exact point test,
+    vehicles on other lanes are out of view. Vehicles on lanes the index does not know get the exact test against
+    every FOV. The result equals the exact test for every vehicle within `margin` of its lane shape (SUMO reports
+    positions on the lane shape, plus the lateral offset of the sublane model).
+
+    The lanes of a footprint are computed once per distinct footprint and cached, a hovering UAV pays only the
+    lane lookup of its vehicles.
+
+    Parameters:
+    calc (Calculations): Exact FOV tests and the cache policy.
+    lane_shapes (LaneShapes): Packed lane shapes, see _network.open_lane_shapes.
+    margin (float): Largest distance of a vehicle position from its lane shape in metres.
+    """
+
+    def __init__(self, calc, lane_shapes, margin=2.0):
+        self.calc = calc
+        self.lanes = lane_shapes
+        self.margin = margin
+        self.footprints = OrderedDict() # footprint corners -> (fully covered lanes, partially covered lanes)
+
+    def vehicle_lanes(self, subscribed_data):
+        # lane index of every vehicle in subscription order, -1 for unknown lanes
+        lane_ids = map(dict.get, subscribed_data.values(), repeat(traci.constants.VAR_LANE_ID))
+        return np.fromiter(map(self.lanes.index.get, lane_ids, repeat(-1)), dtype=np.int64, count=len(subscribed_data))
+
+    def footprint_lanes(self, corners):
+        return self.calc.cached(self.footprints, corners.tobytes(), lambda: self.covered_lanes(corners))
+
+    def covered_lanes(self, corners):
+        lower, upper = corners.min(axis=0) - self.margin, corners.max(axis=0) + self.margin
+        bounds = self.lanes.bounds
+        touching = np.flatnonzero((bounds[:, 0] <= upper[0]) & (bounds[:, 2] >= lower[0]) & (bounds[:, 1] <= upper[1]) & (bounds[:, 3] >= lower[1]))
+        if len(touching) == 0:
+            return touching, touching
+
+        # all points of the touching lanes, tested against the shrunk footprint
+        counts = self.lanes.offsets[touching + 1] - self.lanes.offsets[touching]
+        firsts = np.cumsum(counts) - counts
+        points = self.lanes.points[np.repeat(self.lanes.offsets[touching] - firsts, counts) + np.arange(counts.sum())]
+        origin, edge_u, edge_v = corners[0], corners[1] - corners[0], corners[3] - corners[0]
+        length_u, length_v = np.hypot(*edge_u), np.hypot(*edge_v)
+        if length_u <= 2 * self.margin or length_v <= 2 * self.margin:
+            return touching[:0], touching
+        along_u = (points - origin) @ edge_u / length_u
+        along_v = (points - origin) @ edge_v / length_v
+        inside = (along_u >= self.margin) & (along_u <= length_u - self.margin) & (along_v >= self.margin) & (along_v <= length_v - self.margin)
+        full = np.logical_and.reduceat(inside, firsts)
+        return touching[full], touching[~full]
+
+    @timing_decorator
+    def get_vehicles_in_fovs(self, vehicle_grid, vehicle_lanes, fov_corners):
+        # Same result as Calculations.get_vehicles_in_fovs: vehicle indices inside each of the (U, 4, 2) FOV corners
+        fov_corners = np.asarray(fov_corners, dtype=np.float64).reshape(-1, 4, 2)
+        if len(fov_corners) == 0:
+            return []
+
+        # lane -> (UAV, fully covered) entries of this step, sorted by lane
+        footprints = [self.footprint_lanes(corners) for corners in fov_corners]
+        entry_lanes = np.concatenate([np.concatenate(footprint) for footprint in footprints])
+        entry_uavs = np.repeat(np.arange(len(fov_corners)), [len(full) + len(partial) for full, partial in footprints])
+        entry_full = np.concatenate([np.arange(len(full) + len(partial)) < len(full) for full, partial in footprints])
+        order = np.argsort(entry_lanes, kind='stable')
+        entry_lanes, entry_uavs, entry_full = entry_lanes[order], entry_uavs[order], entry_full[order]
+
+        # every vehicle paired with the UAVs that see its lane, through a dense lane -> entries table whose last
+        # slot (lane -1) is empty
+        lane_counts = np.bincount(entry_lanes, minlength=len(self.lanes) + 1)
+        lane_starts = np.cumsum(lane_counts) - lane_counts
+        starts, counts = lane_starts[vehicle_lanes], lane_counts[vehicle_lanes]
+        vehicles = np.repeat(np.arange(len(vehicle_lanes)), counts)
+        entries = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(len(vehicles))
+        uavs, full = entry_uavs[entries], entry_full[entries]
+        partial = np.flatnonzero(~full)
+        full[partial] = self.calc.vehicles_in_fov_pairs(fov_corners[uavs[partial]], vehicle_grid.positions[vehicles[partial]])
+        vehicles, uavs = vehicles[full], uavs[full]
+
+        # vehicles on unknown lanes (e.g. teleporting) get the exact test against every FOV
+        unknown = np.flatnonzero(vehicle_lanes < 0)
+        if len(unknown):
+            unknown_uavs, columns = np.nonzero(self.calc.vehicles_in_fovs(fov_corners, vehicle_grid.positions[unknown]))
+            vehicles = np.concatenate((vehicles, unknown[columns]))
+            uavs = np.concatenate((uavs, unknown_uavs))
+
+        order = np.lexsort((vehicles, uavs))
+        return np.split(vehicles[order], np.searchsorted(uavs[order], np.arange(1, len(fov_corners))))
@@ -0,0 +1,205 @@
+"""
+Offline benchmarks of SUAVPy
+"""
+
+import argparse
+import datetime
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import ujson as json
+import _fake_traci
+
+_fake_traci.install_module() # SUMO is not needed, the stand-in is used when traci is not installed
+
+from main_ import UAVSimulation
+from _network import read_boundary, read_lanes, open_lane_shapes
+from _visibility import LaneVisibility
+from _fake_traci import FakeTraci, RouteReplay, SyntheticVehicles, read_routes
+
+
+NETWORK_FILE = 'BolognaScenario/acosta_buslanes.net.xml'
+SUMOCFG_FILE = 'BolognaScenario/run.sumocfg'
+ROUTE_FILES = ['BolognaScenario/acosta.rou.xml', 'BolognaScenario/acosta_busses.rou.xml']
+
+
+def random_uav_data(num_UAVs, num_waypoints, total_time, boundary, seed=0):
+    # take-off at t = 0, then waypoints spread over the run at random positions, heights and yaw angles
+    rng = np.random.default_rng(seed)
+    min_x, min_y, max_x, max_y = boundary
+    uav_data = {}
+    for uav_id in range(num_UAVs):
+        x, y = rng.uniform(min_x, max_x), rng.uniform(min_y, max_y)
+        waypoints = [[0, x, y, 0, 0]]
+        for t in np.linspace(0, total_time * 0.9, num_waypoints)[1:]:
+            waypoints.append([float(round(t)), rng.uniform(min_x, max_x), rng.uniform(min_y, max_y), rng.uniform(50, 150), rng.uniform(0, 360)])
+        uav_data[str(uav_id)] = waypoints
+    return uav_data
+
+
+def make_config(uav_data, step_length, total_time, **overrides):
+    config = {'Uav Model': 'Mavic 2e', 'GUI Option': False, 'Remote Server': False, 'Local GUI': False,
+              'Network file': NETWORK_FILE, 'Sumocfg file': SUMOCFG_FILE,
+              'Step length (s)': step_length, 'Total time (s)': total_time,
+              'Number of UAVs': len(uav_data), 'uav_data': uav_data}
+    config.update(overrides)
+    return config
+
+
+def measure(func, repeats):
+    # func() runs one sample and returns its duration in seconds, the first run only warms up caches
+    func()
+    samples = [func() for _ in range(repeats)]
+    return {'min_s': min(samples), 'median_s': statistics.median(samples), 'mean_s': statistics.fmean(samples)}
+
+
+def timed(func):
+    t0 = time.perf_counter()
+    func()
+    return time.perf_counter() - t0
+
+
+def bench_trajectory(args, boundary):
+    # uav_path_data: interpolation of all UAV paths
+    for movement in ('Continuous', 'Discrete'):
+        for uav_mode in ('Hovering', 'Spinning'):
+            for step_length in args.step_lengths:
+                for num_UAVs in args.uavs:
+                    uav_data = random_uav_data(num_UAVs, args.waypoints, args.total_time, boundary, args.seed)
+                    sim = UAVSimulation(make_config(uav_data, step_length, args.total_time, Movement=movement, **{'Uav Mode': uav_mode}))
+                    params = {'movement': movement, 'uav_mode': uav_mode, 'step_length': step_length, 'uavs': num_UAVs, 'waypoints': args.waypoints}
+                    yield 'uav_path_data', params, measure(lambda: timed(sim.uav_path_data), args.repeats)
+
+
+def bench_fov(args, boundary, lanes):
+    # vehicle grid and FOV queries on one step of subscription results
+    lane_shapes = open_lane_shapes(NETWORK_FILE, cache=False)
+    for num_vehicles in args.vehicles:
+        backend = FakeTraci(SyntheticVehicles(lanes, num_vehicles, args.seed), 1.0)
+        backend.subscribed_variables([_fake_traci.VAR_POSITION, _fake_traci.VAR_SPEED, _fake_traci.VAR_LANE_ID])
+        backend.simulationStep()
+        subscribed_data = backend.results()
+        for num_UAVs in args.uavs:
+            uav_data = random_uav_data(num_UAVs, 2, args.total_time, boundary, args.seed)
+            sim = UAVSimulation(make_config(uav_data, 1.0, args.total_time))
+            poses = [waypoints[-1][1:] for waypoints in uav_data.values()]
+            fov_corners = [sim.calc.calculate_fov_corners(pose[:3], sim.calc.fov_calculation(sim.fov_degrees, pose[2]), pose[3]) for pose in poses]
+            vehicle_grid = sim.calc.build_vehicle_grid(subscribed_data)
+            lane_visibility = LaneVisibility(sim.calc, lane_shapes)
+            vehicle_lanes = lane_visibility.vehicle_lanes(subscribed_data)
+            params = {'vehicles': num_vehicles, 'uavs': num_UAVs}
+
+            yield 'vehicle_grid', params, measure(lambda: timed(lambda: sim.calc.build_vehicle_grid(subscribed_data)), args.repeats)
+            yield 'get_vehicles_in_fovs', params, measure(lambda: timed(lambda: sim.calc.get_vehicles_in_fovs(vehicle_grid, fov_corners)), args.repeats)
+            # lane index with the footprints already cached (hovering UAVs), including the lane lookup of the vehicles
+            yield 'lane_vehicles_in_fovs', params, measure(lambda: timed(lambda: lane_visibility.get_vehicles_in_fovs(vehicle_grid, lane_visibility.vehicle_lanes(subscribed_data), fov_corners)), args.repeats)
+            yield 'get_vehicles_in_fov', params, measure(lambda: timed(lambda: [sim.calc.get_vehicles_in_fov(vehicle_grid, pose[:3], sim.calc.fov_calculation(sim.fov_degrees, pose[2]), pose[3])
+                                                                                 for pose in poses]), args.repeats)
+
+
+def bench_simulation(args, boundary, lanes, routes):
+    # whole run_simulation loops against the stand-in backend, output to a temporary file
+    sources = [('synthetic', num_vehicles) for num_vehicles in args.vehicles if num_vehicles <= args.max_simulation_vehicles] + [('routes', None)]
+    total_time = args.steps * args.step_lengths[0]
+    with tempfile.TemporaryDirectory() as output_dir:
+        for source_name, num_vehicles in sources:
+            for subscription in ('Departed', 'Simulation', 'UAV Context'):
+                for num_UAVs in args.uavs:
+                    uav_data = random_uav_data(num_UAVs, args.waypoints, total_time, boundary, args.seed)
+                    config = make_config(uav_data, args.step_lengths[0], total_time, **{'Vehicle Subscription': subscription})
+
+                    def run():
+                        sim = UAVSimulation(config)
+                        if source_name == 'routes':
+                            source = RouteReplay(lanes, routes, start_time=args.replay_start)
+                        else:
+                            source = SyntheticVehicles(lanes, num_vehicles, args.seed)
+                        sim.attach(FakeTraci(source, sim.simulation_step_length))
+                        return timed(lambda: sim.run_simulation(os.path.join(output_dir, 'uav_output.csv')))
+
+                    params = {'source': source_name, 'vehicles': num_vehicles, 'subscription': subscription, 'uavs': num_UAVs,
+                              'steps': args.steps, 'step_length': args.step_lengths[0]}
+                    yield 'run_simulation', params, measure(run, args.repeats)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result):
+    return result['benchmark'], json.dumps(result['params'], sort_keys=True)
+
+
+def compare(results, baseline_file, tolerance):
+    # Prints the median of every benchmark against the baseline, returns the regressions (slower by more than tolerance)
+    with open(baseline_file, 'r') as file:
+        baseline = {result_key(result): result for result in json.load(file)['results']}
+    regressions = []
+    print(f"\n{'benchmark':<22} {'params':<90} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for result in results:
+        old = baseline.get(result_key(result))
+        if old is None:
+            continue
+        ratio = result['median_s'] / old['median_s'] if old['median_s'] > 0 else float('inf')
+        flag = ' <-- slower' if ratio > 1 + tolerance else ''
+        print(f"{result['benchmark']:<22} {result_key(result)[1]:<90} {old['median_s']:>10.5f} {result['median_s']:>10.5f} {ratio:>7.2f}{flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+
+def run_benchmarks(args):
+    boundary = read_boundary(NETWORK_FILE)
+    lanes = read_lanes(NETWORK_FILE)
+    routes = read_routes(ROUTE_FILES) if 'simulation' in args.suite else []
+
+    suites = {'trajectory': lambda: bench_trajectory(args, boundary),
+              'fov': lambda: bench_fov(args, boundary, lanes),
+              'simulation': lambda: bench_simulation(args, boundary, lanes, routes)}
+    results = []
+    for suite in args.suite:
+        for benchmark, params, timings in suites[suite]():
+            results.append({'benchmark': benchmark, 'params': params, 'repeats': args.repeats, **timings})
+            print(f" {benchmark:<22} {json.dumps(params):<100} median {timings['median_s'] * 1e3:10.3f} ms")
+    return {'meta': {'commit': git_commit(), 'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                     'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+                     'processor': platform.processor(), 'seed': args.seed},
+            'results': results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SUAVPy offline against a synthetic TraCI stand-in.")
+    parser.add_argument('--suite', nargs='+', choices=['trajectory', 'fov', 'simulation'], default=['trajectory', 'fov', 'simulation'])
+    parser.add_argument('--vehicles', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--uavs', nargs='+', type=int, default=[1, 10, 50])
+    parser.add_argument('--step-lengths', nargs='+', type=float, default=[0.5, 0.1], help="the first one is used by the simulation suite")
+    parser.add_argument('--waypoints', type=int, default=20, help="waypoints per UAV")
+    parser.add_argument('--total-time', type=float, default=3600, help="simulated seconds of the trajectories")
+    parser.add_argument('--steps', type=int, default=200, help="steps of every run_simulation benchmark")
+    parser.add_argument('--max-simulation-vehicles', type=int, default=10000, help="largest synthetic fleet of the simulation suite")
+    parser.add_argument('--replay-start', type=float, default=1800, help="scenario time the route replay starts at")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='Outputs/benchmarks.json', help="results file (JSON)")
+    parser.add_argument('--compare', default=None, help="earlier results file to compare the medians against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(report['results'], args.compare, args.tolerance)
+        print(f"{len(regressions)} regressions")
+        sys.exit(1 if regressions else 0)
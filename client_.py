@@ -1,90 +1,131 @@
-import socket
-import time
-import json
-import numpy as np
-
-def generate_waypoints(init_time=500, uav_x = 1150, uav_y = 1385, uav_z = 300, num_points=700):
-    """
-    Parameters:
-    init_time (int): Initial time for the UAV path.
-    uav_x (float): Initial x-coordinate.
-    uav_y (float): Initial y-coordinate.
-    z (float): Constant z-coordinate (altitude).
-    yaw (float): Initial yaw angle.
-    num_points (int): Number of waypoints to generate.
-    s=radius power parameter
-
-    Returns:
-    list: A list of waypoints, each containing [time, x, y, z, yaw].
-    """
-    waypoints = []
-    x = np.zeros(num_points)
-    y = np.zeros(num_points)
-    z = np.zeros(num_points)
-    yaw = np.zeros(num_points)
-    
-    for i in range(1, num_points): 
-        x[i] = uav_x + (i**1.1) * np.cos(np.radians(i))
-        y[i] = uav_y + (i) * np.sin(np.radians(i))
-        yaw[i] = (np.degrees(np.arctan2(x[i] - x[i-1], y[i] - y[i-1])) + 360) % 360
-        if z[i-1] < uav_z:
-            z[i] = z[i-1] + 5
-        else:
-            z[i] = uav_z # + (np.random.randint(3) - 1)
-        
-
-    times = np.arange(init_time, init_time + num_points, 1)
-    
-    for i in range(num_points):
-        waypoint = [int(times[i]), float(x[i]), float(y[i]), float(z[i]), float(yaw[i])]
-        waypoints.append(waypoint)
-    
-    return waypoints
-
-def start_client(waypoints):
-    
-    """
-    Establish a TCP connection to a server and send a series of waypoints.
-    
-    This function connects to a server running on 'localhost' at port 1024,
-    sends each waypoint in the `waypoints` list to the server, and prints
-    the server's response. Each waypoint is formatted and sent as a JSON string.
-    
-    Parameters:
-    waypoints (list): A list of waypoints, where each waypoint is a list in the format [time, x, y, z, yaw].
-    
-    Notes:
-    - The server must be running and listening on 'localhost' at port 1024 for the connection to succeed.
-    - The function handles common socket connection errors and ensures the socket is closed properly.
-    - Uncomment the `time.sleep(1)` line if you want to send waypoints with a delay.
-    
-    """
-
-
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client_socket.connect(('localhost', 1024)) #TCP connection
-    print("Connected to the server")
-    
-    try:
-        for waypoint in waypoints:
-            try:
-                message = f"0: {json.dumps(waypoint)}"  
-                client_socket.sendall(message.encode())
-                data = client_socket.recv(1024)
-                print(f"Sent: {message}")
-                print(f"Received from server: {data.decode()}")
-                #time.sleep(1)  # if i want to send a waypoint every second
-            except (ConnectionResetError, ConnectionAbortedError) as e:
-                print(f"Connection error: {e}")
-                break
-            except Exception as e:
-                print(f"An error occurred: {e}")
-                break
-    finally:
-        client_socket.close()
-        print("Client socket closed")
-
-if __name__ == "__main__":
-    waypoints = generate_waypoints()
-    start_client(waypoints)
-
+import socket
+import time
+import json
+import numpy as np
+
+def generate_waypoints(init_time=500, uav_x = 1150, uav_y = 1385, uav_z = 300, num_points=700):
+    """
+    Parameters:
+    init_time (int): Initial time for the UAV path.
+    uav_x (float): Initial x-coordinate.
+    uav_y (float): Initial y-coordinate.
+    z (float): Constant z-coordinate (altitude).
+    yaw (float): Initial yaw angle.
+    num_points (int): Number of waypoints to generate.
+    s=radius power parameter
+
+    Returns:
+    list: A list of waypoints, each containing [time, x, y, z, yaw].
+    """
+    waypoints = []
+    x = np.zeros(num_points)
+    y = np.zeros(num_points)
+    z = np.zeros(num_points)
+    yaw = np.zeros(num_points)
+    
+    for i in range(1, num_points): 
+        x[i] = uav_x + (i**1.1) * np.cos(np.radians(i))
+        y[i] = uav_y + (i) * np.sin(np.radians(i))
+        yaw[i] = (np.degrees(np.arctan2(x[i] - x[i-1], y[i] - y[i-1])) + 360) % 360
+        if z[i-1] < uav_z:
+            z[i] = z[i-1] + 5
+        else:
+            z[i] = uav_z # + (np.random.randint(3) - 1)
+        
+
+    times = np.arange(init_time, init_time + num_points, 1)
+    
+    for i in range(num_points):
+        waypoint = [int(times[i]), float(x[i]), float(y[i]), float(z[i]), float(yaw[i])]
+        waypoints.append(waypoint)
+    
+    return waypoints
+
+def start_client(waypoints, uav_id=0, host='localhost', port=1024, batch_size=100, ack=True):
+    
+    """
+    Establish a TCP connection to a server and send a series of waypoints.
+    
+    This function connects to the waypoint server at `host`:`port` and sends the
+    `waypoints` in batches. Each batch is one newline-terminated JSON message
+    {"uav": uav_id, "waypoints": [...], "ack": ack}, so the server applies a whole
+    batch as a single path update.
+    
+    Parameters:
+    waypoints (list): A list of waypoints, where each waypoint is a list in the format [time, x, y, z, yaw].
+    uav_id (int): UAV that follows the waypoints.
+    host (str): Server host.
+    port (int): Server port.
+    batch_size (int): Number of waypoints per message.
+    ack (bool): Ask the server to acknowledge every message and print the replies.
+    
+    Notes:
+    - The server must be running and listening on `host`:`port` for the connection to succeed.
+    - The batches are sent back to back, the acknowledgements are read after the last one.
+    - The function handles common socket connection errors and ensures the socket is closed properly.
+    
+    """
+
+
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client_socket.connect((host, port)) #TCP connection
+    print("Connected to the server")
+    
+    try:
+        replies = client_socket.makefile('r')
+        batches = [waypoints[i:i + batch_size] for i in range(0, len(waypoints), batch_size)]
+        for batch in batches:
+            message = json.dumps({"uav": uav_id, "waypoints": batch, "ack": ack}) + "\n"
+            client_socket.sendall(message.encode())
+        print(f"Sent: {len(waypoints)} waypoints in {len(batches)} messages")
+        if ack:
+            for _ in batches:
+                print(f"Received from server: {replies.readline().strip()}")
+    except (ConnectionResetError, ConnectionAbortedError) as e:
+        print(f"Connection error: {e}")
+    finally:
+        client_socket.close()
+        print("Client socket closed")
+
+def start_bulk_client(trajectories, host='localhost', port=1024, ack=True):
+    
+    """
+    Send whole trajectories of one or more UAVs in a single binary bulk message.
+    
+    The message is a JSON header line {"type": "bulk", "uavs": [...], "counts": [...], "ack": ack}
+    followed by all waypoints packed as little-endian float64 [time, x, y, z, yaw] rows, in the
+    order of "uavs". The server decodes the payload without copying and applies the
+    trajectories of all listed UAVs as a single path update.
+    
+    Parameters:
+    trajectories (dict): UAV id -> list (or (N, 5) array) of waypoints [time, x, y, z, yaw].
+    host (str): Server host.
+    port (int): Server port.
+    ack (bool): Ask the server to acknowledge the message and print the reply.
+    
+    """
+
+    uav_ids = list(trajectories)
+    waypoints = [np.asarray(trajectories[uav_id], dtype='<f8').reshape(-1, 5) for uav_id in uav_ids]
+    header = {"type": "bulk", "uavs": [int(uav_id) for uav_id in uav_ids], "counts": [len(w) for w in waypoints], "ack": ack}
+    payload = np.concatenate(waypoints).tobytes() if waypoints else b""
+
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client_socket.connect((host, port)) #TCP connection
+    print("Connected to the server")
+    
+    try:
+        client_socket.sendall((json.dumps(header) + "\n").encode() + payload)
+        print(f"Sent: {sum(header['counts'])} waypoints of {len(uav_ids)} UAVs in one message")
+        if ack:
+            print(f"Received from server: {client_socket.makefile('r').readline().strip()}")
+    except (ConnectionResetError, ConnectionAbortedError) as e:
+        print(f"Connection error: {e}")
+    finally:
+        client_socket.close()
+        print("Client socket closed")
+
+if __name__ == "__main__":
+    waypoints = generate_waypoints()
+    start_bulk_client({0: waypoints})
+
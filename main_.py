@@ -1,575 +1,653 @@
-"""
-Main code of SUAVPy
-"""
-
-import threading
-import traci
-import csv
-import numpy as np
-import ujson as json
-import socket
-import os
-import tkinter as tk
-from tkinter import messagebox, ttk, Toplevel, Label
-from _utils import Calculations
-
-import time 
-
-
-def non_blocking_warning(title, message):
-    warning_window = Toplevel()
-    warning_window.title(title)
-    warning_window.geometry("300x80")
-    warning_window.configure(bg='#2E2E2E')
-    icon_path = "images/kiosLogo.ico"
-    warning_window.iconbitmap(icon_path)
-    
-    
-    label = Label(warning_window, text=message, bg='#2E2E2E', bd =5, fg='#FFFFFF', font=('Helvetica', 10))
-    label.pack(pady=10)
-
-    warning_window.after(5000, warning_window.destroy)  # Automatically close after 5 seconds
-    warning_window.attributes("-topmost", True) 
-    
-
-def get_uav_position_input():
-    root = tk.Tk()
-    
-    root.title("Local GUI")
-    
-    root.withdraw()
-
-    # Set the window icon
-    icon_path = "images/kiosLogo.ico"
-    root.iconbitmap(icon_path)
-    
-    root.geometry("400x250")
-    #root.resizable(False, False)
-
-    # Apply a dark theme
-    root.configure(bg='#2E2E2E')
-
-    style = ttk.Style()
-    style.theme_use('alt')  # Using 'alt' as a base theme for customization
-
-    # Configure the style to match a dark theme
-    style.configure('TButton', font=('Helvetica', 11), padding=6, background='#2E2E2E', foreground='#FFFFFF')
-    style.configure('TLabel', font=('Helvetica', 11), padding=5, background='#2E2E2E', foreground='#FFFFFF')
-    style.configure('TEntry', font=('Helvetica', 11), padding=5, fieldbackground='#3C3F41', foreground='#FFFFFF')
-
-    # Create a dialog window for input
-    dialog = tk.Toplevel(root)
-    dialog.configure(bg='#2E2E2E')
-    dialog.iconbitmap(icon_path)
-    
-    dialog.attributes("-topmost", True)
-
-    # UAV ID input
-    uav_id_label = tk.Label(dialog, text="Enter UAV ID:", bg='#2E2E2E', fg='#FFFFFF', font=('Helvetica', 11))
-    uav_id_label.grid(row=0, column=0, sticky='nsew', padx=5, pady=5)  # Centered with 'nsew' sticky option
-    uav_id_entry = tk.Entry(dialog, bg='#3C3F41', fg='#FFFFFF', insertbackground='#FFFFFF', font=('Helvetica', 11))
-    uav_id_entry.grid(row=0, column=1, padx=5, pady=5)
-
-    # UAV position input
-    position_label = tk.Label(dialog, text="Enter UAV position as \n (t, x, y, z, φ):", bg='#2E2E2E', fg='#FFFFFF', font=('Arimo', 11))
-    position_label.grid(row=1, column=0, sticky='nsew', padx=5, pady=5)  # Centered with 'nsew' sticky option
-    position_entry = tk.Entry(dialog, bg='#3C3F41', fg='#FFFFFF', insertbackground='#FFFFFF', font=('Helvetica', 11))
-    position_entry.grid(row=1, column=1, padx=5, pady=5)
-
-    # Button frame
-    button_frame = tk.Frame(dialog, bg='#2E2E2E')
-    button_frame.grid(row=2, columnspan=2, pady=20)
-
-    # Submit button (green)
-    submit_button = tk.Button(button_frame, text="Submit", bg='#4CAF50', fg='#FFFFFF', activebackground='#45A049', font=('Helvetica', 11), command=root.quit)
-    submit_button.grid(row=0, column=0, padx=10)
-
-    # Break button (red) that sends 'break'
-    break_button = tk.Button(button_frame, text="Break", bg='#F44336', fg='#FFFFFF', activebackground='#E57373', font=('Helvetica', 11), command=lambda: (uav_id_entry.insert(0, "break"), root.quit()))
-    break_button.grid(row=0, column=1, padx=10)
-
-    
-    root.mainloop()
-
-    uav_id_value = uav_id_entry.get()
-    position_value = position_entry.get()
-
-    root.destroy()
-    return uav_id_value, position_value
-
-
-class UAVSimulation:
-
-    def __init__(self, config_file):
-        self.read_config(config_file)
-        self.timing_data = {}
-        self.stop_flag = False
-        self.calc = Calculations(self.uav_speed, self.simulation_step_length, self.yaw_speed)
-        self.uav_positions_list, self.time_list, self.uav_yaw_angles_list = self.uav_path_data()
-
-    def read_config(self, config_file):
-        try:
-            with open(config_file, 'r') as file:
-                config = json.load(file)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Configuration file {config_file} not found.")
-        except json.JSONDecodeError:
-            raise ValueError("Configuration file is not a valid JSON.")
-        
-        self.UavModel = config['Uav Model']
-        self.GuiOption = config['GUI Option']
-        self.battery_mode = config.get('Battery Mode', False)
-        self.num_UAVs = config['Number of UAVs']
-        self.UavMode = config.get('Uav Mode', 'Hovering')
-        
-        self.mode = config.get('Input Mode', 'Offline')
-        self.movement = config.get('Movement', 'Continuous')
-        
-        self.server_option = config.get('Remote Server', False)
-        self.local_gui = config.get('Local GUI', False)
-        
-        self.delay_option = config.get('Delay', 0 )
-        
-        self.simulation_step_length = float(config['Step length (s)'])
-        self.total_simulation_steps = int(config['Total time (s)'] / self.simulation_step_length)
-        
-        if self.UavModel == 'Mavic 2e':
-            self.fov_degrees = [68.0643, 40.0455]
-            self.uav_speed = 13.8
-            self.yaw_speed = 10
-            self.battery_life = int(1500 / self.simulation_step_length) # 25 minutes 
-        elif self.UavModel == 'Mini 3 pro':
-            self.fov_degrees = [66.9161, 40.2499]
-            self.uav_speed = 10
-            self.yaw_speed = 10
-            self.battery_life = int(1800 / self.simulation_step_length) # 30 minutes 
-        elif self.UavModel == 'Manual':
-            self.fov_degrees = list(map(float, config['FOV (deg)']))
-            self.uav_speed = float(config['UAV Speed'])
-            self.yaw_speed = float(config['Yaw Speed'])
-            self.battery_life = int(config.get('Battery life (s)',1800)/self.simulation_step_length) # 30 minutes if not stated 
-        else:
-            raise ValueError('UAV model does not exist')
-
-        self.network_file = config['Network file']
-        self.sumocfg_file = config['Sumocfg file']
-        
-        if not os.path.exists(self.sumocfg_file):
-            raise FileNotFoundError(f"SUMO configuration file {self.sumocfg_file} not found.")
-        if not os.path.exists(self.network_file):
-            raise FileNotFoundError(f"SUMO configuration file {self.network_file} not found.")
-    
-        self.uav_data = config['uav_data']
-        
-        if self.server_option:
-            self.uav_data = {str(i): [[0] * 5] for i in range(self.num_UAVs)}
-            
-        
-        print(f' Number of Uavs: {self.num_UAVs} \n Uav Model: {self.UavModel} \n Uav Speed: {self.uav_speed} m/s \n Yaw Speed: {self.yaw_speed} \n Battery Life: {self.battery_life/60*self.simulation_step_length} minutes ')
-    
-
-        
-    def start_sumo(self):         
-        sumo_cmd = ['sumo-gui' if self.GuiOption else 'sumo', "-c", 
-                    self.sumocfg_file, 
-                    "--step-length", str(self.simulation_step_length),
-                    "--delay", str(self.delay_option),
-                    "--start", "true",
-                    "--quit-on-end", "True"]
-                    #"--mesosim", "True"]
-                    #, "--edgedata-output", 'Outputs/edgeData.xml',
-                    #"--fcd-output",'Outputs/fcd.xml']
-
-        traci.start(sumo_cmd)
-        #if self.GuiOption: // Potential Update
-            #traci.gui.setZoom("View #0", 50)
-            #traci.gui.setOffset("View #0", 1145, 150)
-            #traci.gui.setZoom("View #0", 600) 
-            #traci.gui.setOffset("View #0", 1900, 1700)
-            
-            
-    def run_simulation(self, output_file='Outputs/uav_output.csv'):
-        
-        polygon_ids = [f"fov_polygon_{i}" for i in range(self.num_UAVs)]
-        border_polygon_ids = [f"fov_border_polygon_{i}" for i in range(self.num_UAVs)]
-        poi_ids = [f"uav_poi_{i}" for i in range(self.num_UAVs)]
-        icon_paths = {'Manual': "images/manualLQ.png",
-                      'Mini 3 pro': "images/mini3proLQ.png",
-                      'Mavic 2e': "images/mavic2e.png"}
-    
-        icon_path = icon_paths.get(self.UavModel, "images/manualLQ.png")
-        self.battery_life_steps = int(self.battery_life)
-        # Initialize battery_life_steps based on the first time value in uav_data
-        battery_life_steps = {str(uav_id): max(0, self.uav_data[str(uav_id)][0][0]) for uav_id in range(self.num_UAVs)}
-        polygon_exists = {i: False for i in range(self.num_UAVs)}
-        poi_exists = {i: False for i in range(self.num_UAVs)}
-        
-        with open(output_file, mode='w', newline='') as file:
-            writer = csv.writer(file, delimiter=',')
-            writer.writerow(['Step', 'Seconds', 'UAV_ID', 'UAV_X', 'UAV_Y', 'UAV_Z', 'Yaw', 'VehicleID', 'X', 'Y', 'Speed'])
-    
-            step = 0
-    
-            if self.local_gui:
-                user_input_thread = threading.Thread(target=self.get_user_input)
-                user_input_thread.start()
-                
-            if self.server_option:
-                server_thread = threading.Thread(target=self.start_server)
-                server_thread.start()
-                    
-            while step < self.total_simulation_steps and not self.stop_flag:
-                
-                traci.simulationStep()
-                step += 1
-    
-                for veh_id in traci.simulation.getDepartedIDList():
-                    traci.vehicle.subscribe(veh_id, [traci.constants.VAR_POSITION, traci.constants.VAR_SPEED])
-                subscribed_data = traci.vehicle.getAllSubscriptionResults()
-    
-                for uav_id, (uav_positions, times, uav_yaw_angles) in enumerate(zip(self.uav_positions_list, self.time_list, self.uav_yaw_angles_list)):
-                    
-                    if step == 1 and self.GuiOption:
-                        uav_position = uav_positions[0]
-                        yaw_angle = uav_yaw_angles[0]
-                        field_of_view_size = self.calc.fov_calculation(self.fov_degrees, uav_position[2])
-                        self.calc.add_fov_polygon(uav_position, field_of_view_size, yaw_angle, polygon_ids[uav_id], border_polygon_ids[uav_id])
-                        self.calc.add_poi(poi_ids[uav_id], uav_position, yaw_angle, icon_path)
-                        polygon_exists[uav_id] = True
-                        poi_exists[uav_id] = True
-                    
-                    if self.battery_mode and step < len(times) and uav_positions[step][2] > 0:
-                        battery_life_steps[str(uav_id)] += 1
-    
-                        if battery_life_steps[str(uav_id)] == self.battery_life_steps - (300 / self.simulation_step_length):
-                            #print(f" \n Warning: Uav: {uav_id} has 5 minutes of battery left \n ")
-                            non_blocking_warning("Battery Warning", f"Warning: UAV {uav_id} has 5 minutes of battery left.")
-                            #messagebox.showwarning("Battery Warning", f"Warning: UAV {uav_id} has 5 minutes of battery left.")
-                            
-                        if battery_life_steps[str(uav_id)] == self.battery_life_steps:
-                            if polygon_exists[uav_id]:
-                                self.calc.remove_fov_polygon(polygon_ids[uav_id], border_polygon_ids[uav_id])
-                                polygon_exists[uav_id] = False
-                            if poi_exists[uav_id]: 
-                                self.calc.remove_poi(poi_ids[uav_id])
-                                poi_exists[uav_id] = False
-                            #print(f" \n Uav: {uav_id} lost signal \n")
-                            non_blocking_warning("Signal Lost", f"UAV {uav_id} lost signal.")
-                            #messagebox.showwarning("Signal Lost", f"UAV {uav_id} lost signal.")                       
-                            continue
-    
-                    if step in times:
-                        index = times.index(step)
-                        if index < len(uav_positions) and index < len(uav_yaw_angles):
-                            uav_position = uav_positions[index]
-                            yaw_angle = uav_yaw_angles[index]
-                            field_of_view_size = self.calc.fov_calculation(self.fov_degrees, uav_position[2])
-                            
-                            
-                            # reduce the long if statements.
-                            moved = index > 0 and (np.any(np.array(uav_positions[index - 1]) != np.array(uav_position)) or uav_yaw_angles[index - 1] != yaw_angle)
-                            update_required = self.GuiOption and moved
-    
-                            if self.GuiOption:
-                                if polygon_exists[uav_id] and update_required:
-                                    self.calc.update_fov_polygon(uav_position, field_of_view_size, yaw_angle, polygon_ids[uav_id], border_polygon_ids[uav_id])
-                                if step % 1 == 0 and poi_exists[uav_id] and update_required: ## PERFORMANCE CHECK ##
-                                    self.calc.update_poi(poi_ids[uav_id], uav_position, yaw_angle)
-    
-                            if self.UavMode == 'Sampling':
-                                if moved:
-                                    if polygon_exists[uav_id]:
-                                        self.calc.remove_fov_polygon(polygon_ids[uav_id], border_polygon_ids[uav_id])
-                                        polygon_exists[uav_id] = False
-                                elif not polygon_exists[uav_id]:
-                                    self.calc.add_fov_polygon(uav_position, field_of_view_size, yaw_angle, polygon_ids[uav_id], border_polygon_ids[uav_id])
-                                    polygon_exists[uav_id] = True
-                                    
-                            # REMOVE OR ADD FOR CONSECUTIVE UAV POSITIONS           
-                            writer.writerow([step, step * self.simulation_step_length, uav_id, uav_position[0], uav_position[1], uav_position[2], yaw_angle, '', '', '', ''])
-    
-                            if not (self.UavMode == 'Sampling' and moved):
-                                vehicles_info = self.calc.get_vehicles_in_fov(subscribed_data, uav_position, field_of_view_size, yaw_angle, return_info=('positions', 'speeds'))
-                                vehicles_in_view = vehicles_info['vehicle_ids']
-                                positions_in_view = vehicles_info['positions']
-                                speeds_in_view = vehicles_info['speeds']
-                                     
-                                for vehicle_id, position, speed in zip(vehicles_in_view, positions_in_view, speeds_in_view):
-                                    writer.writerow([step, step * self.simulation_step_length, uav_id, uav_position[0], uav_position[1], uav_position[2], yaw_angle, vehicle_id, position[0], position[1], speed])
-    
-            if self.local_gui:
-                self.stop_flag = True
-                user_input_thread.join()
-                
-            if self.server_option:
-                self.stop_flag = True
-                server_thread.join()
-        
-        traci.close()
-        print("TraCI is closed")
-        
-
-    
-
-        
-    def start_server(self):
-        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server_socket.bind(('localhost', 1024))
-        server_socket.listen(1)
-        print("Python server is waiting for a connection...")
-        
-        try:
-            conn, addr = server_socket.accept()
-            with conn:
-                print(f"Connected by {addr}")
-                while not self.stop_flag:
-                    try:
-                        data = conn.recv(1024)
-                        if not data:
-                            continue
-                        data = data.decode()
-                        print(f"Received data from client: {data}")
-                        response = f"Data received: {data}"
-                        conn.sendall(response.encode())
-                        
-                        # parse data and update UAV path
-                        uav_id, details = data.split(":")
-                        uav_id = int(uav_id.strip())
-                        details = json.loads(details.strip())
-                        if uav_id in range(self.num_UAVs):
-                            self.update_uav_path(uav_id, details)
-                    except (ConnectionResetError, ConnectionAbortedError) as e:
-                        print(f"Connection error: {e}")
-                        break
-                    except Exception as e:
-                        print(f"An error occurred: {e}")
-                        break
-        finally:
-            server_socket.close()
-            print("Server socket closed")
-
-    
-    def get_user_input(self):
-        while not self.stop_flag:
-            uav_id, position_str = get_uav_position_input()
-    
-            # Check if the break button was pressed
-            if uav_id.strip().lower() == 'break':
-                self.stop_flag = True
-                break
-    
-            try:
-                uav_id = int(uav_id.strip())
-                position = json.loads(position_str.strip())
-                if uav_id in range(self.num_UAVs):
-                    self.update_uav_path(uav_id, position)
-                else:
-                    messagebox.showerror("Invalid Input", "The UAV ID is out of range.")
-            except ValueError:
-                messagebox.showerror("Invalid Input", "Please enter a valid UAV ID and position format.")
-            except json.JSONDecodeError:
-                messagebox.showerror("Invalid JSON Format", "Please ensure the position is in the correct JSON format.")
-
-
-
-    def update_uav_path(self, uav_id, details):
-        # Here I ignore one waypoint after the new entry
-        
-        time, x, y, z, yaw_angle = details
-    
-        # Check if local GUI is true and modify the path accordingly
-        if self.local_gui:
-            if str(uav_id) in self.uav_data:
-                # Find the index of the next waypoint to be executed
-                next_index = next((idx for idx, point in enumerate(self.uav_data[str(uav_id)]) if point[0] > time), None)
-                
-                # Insert the new waypoint
-                self.uav_data[str(uav_id)].insert(next_index, [time, x, y, z, yaw_angle])
-                
-                # Remove the next waypoint in the sequence
-                if next_index is not None and len(self.uav_data[str(uav_id)]) > next_index + 1:
-                    self.uav_data[str(uav_id)].pop(next_index + 1)
-    
-        # Otherwise, proceed as before
-        else:
-            if str(uav_id) in self.uav_data:
-                self.uav_data[str(uav_id)].append([time, x, y, z, yaw_angle])
-                self.uav_data[str(uav_id)] = sorted(self.uav_data[str(uav_id)])  # sort the UAV data
-    
-        # Recalculate paths with new input
-        self.uav_positions_list, self.time_list, self.uav_yaw_angles_list = self.uav_path_data()
-        
-
-
-    def uav_path_data(self):
-        uav_positions_list = []
-        time_list = []
-        uav_yaw_angles_list = []
-    
-        for uav_id in range(self.num_UAVs):
-            data_points = self.uav_data[str(uav_id)]
-            
-            positions = [[point[1], point[2], point[3]] for point in data_points]
-            yaw_angles = [point[4] for point in data_points]
-            times = [int(point[0] / self.simulation_step_length) for point in data_points]
-    
-            if self.movement == 'Discrete': # and self.server_updated_paths:
-                # when server or script is on we do not follow the simple dynamics (rotate-hover-rotate)
-                uav_positions_list.append(positions)
-                time_list.append(times)
-                uav_yaw_angles_list.append(yaw_angles)
-            else:
-                uav_positions = []
-                step_times = []
-                uav_yaw_angles = []
-                total_steps = times[0]  # start of counting
-    
-                for i in range(len(positions) - 1):
-                    init_pos = np.array(positions[i])
-                    next_pos = np.array(positions[i + 1])
-                    current_yaw_angle = yaw_angles[i]
-                    target_yaw_angle = yaw_angles[i + 1]
-                    next_step = times[i + 1]
-    
-                    move_yaw_angle = self.calc.calculate_yaw_angle(init_pos, next_pos) # angle between the two 'move' positions  
-                    move_steps = self.calc.calculate_move_steps(init_pos, next_pos) # steps needed to move from A to B
-                    rotate_to_move_steps = self.calc.calculate_rotate_steps(move_yaw_angle - current_yaw_angle) # steps needed to rotate before start moving
-                    rotate_to_target_steps =  self.calc.calculate_rotate_steps(target_yaw_angle - move_yaw_angle) # steps needed to rotate after reaching position but not yaw angle
-                        
-                    while total_steps < next_step: # HOVER PARALLELS
-                        uav_positions.append(init_pos)
-                        step_times.append(total_steps)
-                        if self.UavMode == 'Hovering' or self.UavMode == 'Sampling':
-                            uav_yaw_angles.append(current_yaw_angle)
-                        elif self.UavMode == 'Spinning':
-                            current_yaw_angle += self.yaw_speed * self.simulation_step_length
-                            uav_yaw_angles.append(current_yaw_angle)
-                        total_steps += 1
-                        
-                        
-                    if self.UavMode == 'Spinning':
-                        current_yaw_angle = current_yaw_angle % 360  # fast spinning fix.
-                        rotate_to_move_steps = self.calc.calculate_rotate_steps(move_yaw_angle - current_yaw_angle) 
-                    
-                    if np.array_equal(init_pos[:2], next_pos[:2]):                
-                        # No horizontal movement, only change in height or yaw
-                        rotate_to_target_steps = self.calc.calculate_rotate_steps(target_yaw_angle - current_yaw_angle)
-                        move_steps = self.calc.calculate_move_steps(init_pos, next_pos)                  
-                        
-                        # Move to the new height, no yaw change
-                        for step in range(move_steps):
-                            position = init_pos + (next_pos - init_pos) * (step + 1) / move_steps
-                            uav_positions.append(position)
-                            step_times.append(total_steps)
-                            uav_yaw_angles.append(current_yaw_angle)  # Keep the same yaw while changing height
-                            total_steps += 1                        
-                        
-                        for step in range(rotate_to_target_steps):
-                            yaw = current_yaw_angle + (target_yaw_angle - current_yaw_angle) * (step + 1) / rotate_to_target_steps
-                            uav_positions.append(next_pos)
-                            step_times.append(total_steps)
-                            uav_yaw_angles.append(yaw)
-                            total_steps += 1
-                            
-                    else:
-                        for step in range(rotate_to_move_steps):
-                            yaw = current_yaw_angle + (move_yaw_angle - current_yaw_angle) * (step + 1) / rotate_to_move_steps
-                            uav_positions.append(init_pos)
-                            step_times.append(total_steps)
-                            uav_yaw_angles.append(yaw)
-                            total_steps += 1
-        
-                        for step in range(move_steps):
-                            position = init_pos + (next_pos - init_pos) * (step + 1) / move_steps
-                            uav_positions.append(position)
-                            step_times.append(total_steps)
-                            uav_yaw_angles.append(move_yaw_angle) # uav_yaw_angles.append(current_yaw_angle)
-                            total_steps += 1
-        
-                        if self.UavMode != 'Spinning':
-                            for step in range(rotate_to_target_steps):
-                                yaw = move_yaw_angle + (target_yaw_angle - move_yaw_angle) * (step + 1) / rotate_to_target_steps
-                                uav_positions.append(next_pos)
-                                step_times.append(total_steps)
-                                uav_yaw_angles.append(yaw)
-                                total_steps += 1
-
-                final_pos = np.array(positions[-1])
-                final_yaw_angle = yaw_angles[-1]
-    
-                # hovering at the final position until the end of simulation
-                while total_steps < self.total_simulation_steps:
-                    uav_positions.append(final_pos)
-                    step_times.append(total_steps)
-                    if self.UavMode =='Spinning':
-                        final_yaw_angle += self.yaw_speed * self.simulation_step_length
-                    uav_yaw_angles.append(final_yaw_angle)
-                    total_steps += 1
-    
-                uav_positions_list.append(uav_positions)
-                time_list.append(step_times)
-                uav_yaw_angles_list.append(uav_yaw_angles)
-    
-        return uav_positions_list, time_list, uav_yaw_angles_list
-
-
-    
-        
-def start_simulation_thread(sim, tk_root):
-    try:
-        sim.start_sumo()
-        sim.run_simulation()
-    except traci.exceptions.FatalTraCIError:
-        print("Simulation terminated due to SUMO closing.")
-    finally:
-        try:
-            traci.close()
-        except traci.exceptions.FatalTraCIError:
-            print("TraCI was already closed.")
-        # Stop Tkinter main loop once simulation finishes
-        tk_root.quit()  # Stops the Tkinter loop
-
-if __name__ == "__main__":
-    #Initialize Tkinter main window
-    root = tk.Tk()
-    root.withdraw()  # Hide the main window since we don't need it
-
-    # Initialize the simulation
-    sim = UAVSimulation('config.json')
-
-    # Start the simulation in a separate thread so it doesn't block the Tkinter event loop
-    simulation_thread = threading.Thread(target=start_simulation_thread, args=(sim, root))
-    simulation_thread.start()
-
-    # Start the Tkinter event loop (this must run in the main thread)
-    root.mainloop()
-
-    # Wait for the simulation thread to finish
-    simulation_thread.join()
-
-    # Exit the program once everything is done
-    print("Simulation and UI closed.")
-
-#######
-#######
-#######
-
-# if __name__ == "__main__":
-    
-#     sim = UAVSimulation('config.json')
-    
-#     try:
-#          t0 = time.time()
-#          sim.start_sumo()
-#          sim.run_simulation()
-#          t1 = time.time()
-#          print(f"Elapsed time: {t1 - t0} seconds")
-#     except traci.exceptions.TraCIException:
-#          traci.close()
-#          print("TraCI is fully closed from exception")
-
-#######
-#######
-#######
-        
-
+"""
+Main code of SUAVPy
+"""
+
+import argparse
+import threading
+try:
+    import traci
+except ImportError: # FCD replays and benchmarks run without SUMO
+    from _fake_traci import install_module
+    traci = install_module()
+import numpy as np
+import ujson as json
+import os
+import copy
+import contextlib
+from _utils import Calculations, backend_errors
+from _trajectory import TrajectoryEngine, TrajectorySnapshot
+from _fleet import FleetState
+from _battery import BatteryMonitor, ConstantDrain, SpeedDrain, AltitudeDrain, WARNING
+from _gui import GuiUpdater
+from _outputs import open_output, step_columns, NO_VEHICLES
+from _aggregates import WindowAggregator
+from _tracks import TrackTable
+from _checkpoint import save_checkpoint, load_checkpoint
+from _events import EventBus, JsonEventSink, log_sink, BATTERY_WARNING, SIGNAL_LOST
+from _network import read_boundary, open_lane_shapes
+from _visibility import LaneVisibility
+from _server import WaypointServer
+from _subscriptions import VEHICLE_VARIABLES, DepartedSubscription, SimulationContextSubscription, UAVContextSubscription
+from _profiling import profiler
+from _fake_traci import FakeTraci
+from _fcd import FcdVehicles, open_fcd
+
+import time 
+
+
+class UAVSimulation:
+
+    def __init__(self, config_file):
+        self.read_config(config_file)
+        self.timing_data = {}
+        self.stop_flag = False
+        self.traci = traci
+        self.traci_error, self.fatal_error = backend_errors(traci)
+        self.traci_closed = True # nothing to close until start_sumo attaches a backend
+        self.calc = Calculations(self.uav_speed, self.simulation_step_length, self.yaw_speed, self.grid_cell_size, self.footprint_cache_size)
+        self.trajectory = TrajectoryEngine(self.calc, self.UavMode, self.movement, self.simulation_step_length, self.yaw_speed, self.total_simulation_steps)
+        self.path_lock = threading.Lock() # serializes path writers (server and local GUI threads), the simulation loop only takes it to save or restore a checkpoint
+        self.path_snapshot = TrajectorySnapshot(self.uav_path_data())
+        self.lane_visibility = LaneVisibility(self.calc, open_lane_shapes(self.network_file, self.lane_cache), self.lane_margin) if self.lane_index else None
+        self.events = EventBus() # battery and signal warnings, the GUI windows subscribe in __main__
+        if self.event_log:
+            self.events.subscribe(log_sink)
+
+    def read_config(self, config_file):
+        if isinstance(config_file, dict): # already loaded, e.g. one run of a parameter sweep
+            config = config_file
+        else:
+            try:
+                with open(config_file, 'r') as file:
+                    config = json.load(file)
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Configuration file {config_file} not found.")
+            except json.JSONDecodeError:
+                raise ValueError("Configuration file is not a valid JSON.")
+        
+        self.UavModel = config['Uav Model']
+        self.GuiOption = config['GUI Option']
+        self.battery_mode = config.get('Battery Mode', False)
+        # 'Speed' and 'Altitude' drain the battery faster when flying fast or high, by Battery Drain Factor at the UAV speed / 100 m
+        self.battery_drain = config.get('Battery Drain', 'Constant')
+        if self.battery_drain not in ('Constant', 'Speed', 'Altitude'):
+            raise ValueError('Battery drain model does not exist')
+        self.battery_drain_factor = float(config.get('Battery Drain Factor', 0.5))
+        self.num_UAVs = config['Number of UAVs']
+        self.UavMode = config.get('Uav Mode', 'Hovering')
+        
+        self.mode = config.get('Input Mode', 'Offline')
+        self.movement = config.get('Movement', 'Continuous')
+        
+        self.server_option = config.get('Remote Server', False)
+        self.server_host = config.get('Server Host', 'localhost')
+        self.server_port = int(config.get('Server Port', 1024))
+        self.server_acks = config.get('Server Acks', False) # acknowledge every message, clients can also ask per message
+        self.local_gui = config.get('Local GUI', False)
+        # no Tkinter and no sumo-gui, e.g. batch workers on servers without a display
+        self.headless = config.get('Headless', False)
+        if self.headless and (self.GuiOption or self.local_gui):
+            print(' Headless runs have no GUI, the GUI options are ignored')
+            self.GuiOption = self.local_gui = False
+        self.event_log = config.get('Event Log', True) # warnings go to the 'suavpy' logger
+        self.event_file = config.get('Event File') # and, when given, to a JSON lines file
+        
+        self.delay_option = config.get('Delay', 0 )
+        self.seed = config.get('Seed') # SUMO random seed, SUMO's default when not given
+        
+        self.backend = config.get('Backend', 'traci')
+        if self.backend not in ('traci', 'libsumo'):
+            raise ValueError('Backend does not exist')
+        if self.backend == 'libsumo' and self.GuiOption:
+            print(' libsumo has no GUI, the GUI option runs on TraCI')
+            self.backend = 'traci'
+        self.grid_cell_size = float(config.get('Grid Cell Size (m)', 100)) # cell size of the per-step vehicle grid
+        self.footprint_cache_size = int(config.get('Footprint Cache Size', 4096)) # FOV footprints kept per distinct altitude and yaw
+        # vehicles are matched to the FOVs by their lane (VAR_LANE_ID), lanes are intersected with each footprint once
+        self.lane_index = config.get('Lane Index', False)
+        self.lane_margin = float(config.get('Lane Margin (m)', 2.0)) # largest distance of a vehicle from its lane shape
+        self.lane_cache = config.get('Lane Cache', True) # keep the parsed lane shapes as '<network>.lanes.npz'
+        
+        # 'FCD' replays the vehicles recorded by SUMO's --fcd-output (e.g. 'FCD Output' of an earlier run) instead of running SUMO
+        self.vehicle_source = config.get('Vehicle Source', 'SUMO')
+        if self.vehicle_source not in ('SUMO', 'FCD'):
+            raise ValueError('Vehicle source does not exist')
+        self.fcd_file = config.get('FCD file')
+        self.fcd_cache = config.get('FCD Cache', True) # convert the XML to a columnar .npz once and replay from it
+        self.fcd_output = config.get('FCD Output') # record the SUMO vehicles for later replays
+        if self.vehicle_source == 'FCD':
+            if self.fcd_file is None:
+                raise ValueError('FCD file is required by the FCD vehicle source')
+            if self.GuiOption:
+                print(' FCD replays have no GUI, the GUI option is ignored')
+                self.GuiOption = False
+        
+        # sumo-gui redraws a UAV only after it moved or turned more than this, at most Render Rate times per second (0 = every step)
+        self.gui_threshold = float(config.get('GUI Threshold (m)', 0))
+        self.gui_angle_threshold = float(config.get('GUI Angle Threshold (deg)', 0))
+        self.gui_render_rate = float(config.get('GUI Render Rate (Hz)', 0))
+        
+        self.profiling = config.get('Profiling', False) # per-phase step timings, written to the report after the run
+        self.profile_report = config.get('Profile Report', 'Outputs/profile.json') # .json or .csv
+        
+        self.output_format = config.get('Output Format', 'csv')
+        self.output_buffer_rows = int(config.get('Output Buffer Rows', 100000))
+        self.output_queue_size = int(config.get('Output Queue Size', 256)) # steps waiting for the writer thread, 0 writes synchronously
+        self.output_backpressure = config.get('Output Backpressure', 'block')
+        # 'Raw' rows, 'Aggregate' per-window statistics and a heatmap, 'Tracks' one row per vehicle track, or a list of them ('Both' is Raw and Aggregate)
+        output_mode = config.get('Output Mode', 'Raw')
+        self.outputs = {'Raw', 'Aggregate'} if output_mode == 'Both' else set([output_mode] if isinstance(output_mode, str) else output_mode)
+        if not self.outputs or not self.outputs <= {'Raw', 'Aggregate', 'Tracks'}:
+            raise ValueError('Output mode does not exist')
+        self.aggregation_window = float(config.get('Aggregation Window (s)', 60))
+        self.heatmap_cell_size = float(config.get('Heatmap Cell Size (m)', 50))
+        self.track_timeout = float(config.get('Track Timeout (s)', 60)) # tracks unseen for this long are written and dropped, 0 keeps them until the end
+        
+        # every Checkpoint Interval simulated seconds the SUMO state and the simulation state are saved, 'python main_.py --resume' continues from there
+        self.checkpoint_interval = float(config.get('Checkpoint Interval (s)', 0))
+        self.checkpoint_dir = config.get('Checkpoint Directory', 'Outputs/checkpoint')
+        if self.checkpoint_interval > 0 and self.output_format != 'csv':
+            raise ValueError('Checkpoints need the csv output format')
+        if self.checkpoint_interval > 0 and 'Aggregate' in self.outputs:
+            raise ValueError('Checkpoints do not support the Aggregate output')
+        self.config = config # stored in the checkpoints, a resumed run uses the same configuration
+        
+        self.subscription_mode = config.get('Vehicle Subscription', 'Departed')
+        if self.subscription_mode not in ('Departed', 'Simulation', 'UAV Context'):
+            raise ValueError('Vehicle subscription mode does not exist')
+        
+        self.simulation_step_length = float(config['Step length (s)'])
+        self.total_simulation_steps = int(config['Total time (s)'] / self.simulation_step_length)
+        
+        if self.UavModel == 'Mavic 2e':
+            self.fov_degrees = [68.0643, 40.0455]
+            self.uav_speed = 13.8
+            self.yaw_speed = 10
+            self.battery_life = int(1500 / self.simulation_step_length) # 25 minutes 
+        elif self.UavModel == 'Mini 3 pro':
+            self.fov_degrees = [66.9161, 40.2499]
+            self.uav_speed = 10
+            self.yaw_speed = 10
+            self.battery_life = int(1800 / self.simulation_step_length) # 30 minutes 
+        elif self.UavModel == 'Manual':
+            self.fov_degrees = list(map(float, config['FOV (deg)']))
+            self.uav_speed = float(config['UAV Speed'])
+            self.yaw_speed = float(config['Yaw Speed'])
+            self.battery_life = int(config.get('Battery life (s)',1800)/self.simulation_step_length) # 30 minutes if not stated 
+        else:
+            raise ValueError('UAV model does not exist')
+
+        self.network_file = config['Network file']
+        self.sumocfg_file = config['Sumocfg file']
+        
+        if not os.path.exists(self.sumocfg_file):
+            raise FileNotFoundError(f"SUMO configuration file {self.sumocfg_file} not found.")
+        if not os.path.exists(self.network_file):
+            raise FileNotFoundError(f"SUMO configuration file {self.network_file} not found.")
+    
+        self.uav_data = config['uav_data']
+        
+        if self.server_option:
+            self.uav_data = {str(i): [[0] * 5] for i in range(self.num_UAVs)}
+            
+        
+        print(f' Number of Uavs: {self.num_UAVs} \n Uav Model: {self.UavModel} \n Uav Speed: {self.uav_speed} m/s \n Yaw Speed: {self.yaw_speed} \n Battery Life: {self.battery_life/60*self.simulation_step_length} minutes ')
+    
+
+        
+    def battery_drain_model(self):
+        if self.battery_drain == 'Speed':
+            return SpeedDrain(self.uav_speed, self.battery_drain_factor)
+        if self.battery_drain == 'Altitude':
+            return AltitudeDrain(100.0, self.battery_drain_factor)
+        return ConstantDrain()
+        
+        
+    def start_sumo(self, label=None):         
+        sumo_cmd = ['sumo-gui' if self.GuiOption else 'sumo', "-c", 
+                    self.sumocfg_file, 
+                    "--step-length", str(self.simulation_step_length),
+                    "--delay", str(self.delay_option),
+                    "--start", "true",
+                    "--quit-on-end", "True"]
+                    #"--mesosim", "True"]
+                    #, "--edgedata-output", 'Outputs/edgeData.xml',
+                    #"--fcd-output",'Outputs/fcd.xml']
+        if self.seed is not None:
+            sumo_cmd += ["--seed", str(self.seed)]
+        if self.fcd_output:
+            sumo_cmd += ["--fcd-output", self.fcd_output]
+        if self.checkpoint_interval > 0:
+            sumo_cmd += ["--save-state.rng", "true"] # a resumed run draws the same random numbers
+
+        if self.vehicle_source == 'FCD':
+            # no SUMO process, the recorded vehicles are replayed through the TraCI stand-in
+            self.attach(FakeTraci(FcdVehicles(open_fcd(self.fcd_file, self.fcd_cache)), self.simulation_step_length))
+            return
+        if self.backend == 'libsumo':
+            import libsumo # in-process SUMO, only needed for headless runs
+            libsumo.start(sumo_cmd)
+            self.traci = libsumo
+        elif label is not None:
+            # labelled connection, several simulations can run side by side
+            traci.start(sumo_cmd, label=label)
+            self.traci = traci.getConnection(label)
+        else:
+            traci.start(sumo_cmd)
+            self.traci = traci
+        self.attach(self.traci)
+        #if self.GuiOption: // Potential Update
+            #traci.gui.setZoom("View #0", 50)
+            #traci.gui.setOffset("View #0", 1145, 150)
+            #traci.gui.setZoom("View #0", 600) 
+            #traci.gui.setOffset("View #0", 1900, 1700)
+            
+    
+    def attach(self, backend):
+        # every TraCI call of the simulation goes through this backend (traci, a labelled connection, libsumo or a stand-in)
+        self.traci = backend
+        self.calc.traci = backend
+        self.traci_error, self.fatal_error = backend_errors(backend)
+        self.calc.traci_error = self.traci_error
+        self.traci_closed = False
+        self.vehicle_subscription = self.subscribe_vehicles()
+            
+            
+    def subscribe_vehicles(self):
+        variables = VEHICLE_VARIABLES + [traci.constants.VAR_LANE_ID] if self.lane_index else VEHICLE_VARIABLES
+        if self.subscription_mode == 'Simulation':
+            return SimulationContextSubscription(self.traci, variables=variables)
+        if self.subscription_mode == 'UAV Context':
+            return UAVContextSubscription(self.traci, self.calc, self.fov_degrees, self.num_UAVs, variables=variables)
+        return DepartedSubscription(self.traci, variables)
+            
+            
+    def run_simulation(self, output_file='Outputs/uav_output.csv', checkpoint=None):
+        # checkpoint: state from _checkpoint.load_checkpoint, the run continues after its step in the same output files
+        if checkpoint is not None:
+            output_file = checkpoint['output_file']
+            self.restore(checkpoint)
+        
+        icon_paths = {'Manual': "images/manualLQ.png",
+                      'Mini 3 pro': "images/mini3proLQ.png",
+                      'Mavic 2e': "images/mavic2e.png"}
+    
+        icon_path = icon_paths.get(self.UavModel, "images/manualLQ.png")
+        gui = GuiUpdater(self.traci, self.calc, self.fov_degrees, self.num_UAVs, icon_path, self.gui_threshold, self.gui_angle_threshold, self.gui_render_rate) if self.GuiOption else None
+        self.battery_life_steps = int(self.battery_life)
+        fleet = FleetState(self.num_UAVs)
+        # Initialize the battery counters based on the first time value in uav_data
+        battery = BatteryMonitor(self.num_UAVs, self.battery_life_steps, 300 / self.simulation_step_length, self.simulation_step_length,
+                                 self.battery_drain_model(), [max(0, self.uav_data[str(uav_id)][0][0]) for uav_id in range(self.num_UAVs)]) if self.battery_mode else None
+        uav_rows = 0
+        detection_rows = 0
+        start_step = 0
+        if checkpoint is not None:
+            battery = checkpoint['battery'] if self.battery_mode else None
+            uav_rows, detection_rows, start_step = checkpoint['uav_rows'], checkpoint['detection_rows'], checkpoint['step']
+        checkpoint_steps = int(round(self.checkpoint_interval / self.simulation_step_length)) if self.checkpoint_interval > 0 else 0
+        
+        if self.profiling:
+            profiler.reset()
+            profiler.enable()
+        t0 = time.perf_counter()
+        timer = profiler.step_timer() # does nothing while profiling is off
+        
+        raw_output = open_output(output_file, self.output_format, self.output_buffer_rows, self.output_queue_size, self.output_backpressure,
+                                 checkpoint and checkpoint['raw_offset']) if 'Raw' in self.outputs else contextlib.nullcontext()
+        aggregate_output = WindowAggregator(output_file, self.num_UAVs, round(self.aggregation_window / self.simulation_step_length), self.simulation_step_length,
+                                            read_boundary(self.network_file), self.heatmap_cell_size) if 'Aggregate' in self.outputs else contextlib.nullcontext()
+        track_output = TrackTable(output_file, self.num_UAVs, self.simulation_step_length, self.track_timeout,
+                                  resume_state=checkpoint and checkpoint['tracks']) if 'Tracks' in self.outputs else contextlib.nullcontext()
+        event_output = JsonEventSink(self.event_file, checkpoint and checkpoint.get('events_offset')) if self.event_file else contextlib.nullcontext()
+        
+        with raw_output as sink, aggregate_output as aggregates, track_output as tracks, event_output as event_sink:
+    
+            step = start_step
+            if event_sink:
+                self.events.subscribe(event_sink)
+    
+            if self.local_gui:
+                user_input_thread = threading.Thread(target=self.get_user_input)
+                user_input_thread.start()
+                
+            if self.server_option:
+                server_thread = threading.Thread(target=self.start_server)
+                server_thread.start()
+                    
+            while step < self.total_simulation_steps and not self.stop_flag:
+                
+                # path updates are picked up here, at the step boundary, and the whole step uses this snapshot
+                paths = self.path_snapshot
+                self.vehicle_subscription.prepare(paths, step + 1)
+                timer.mark('subscription')
+                self.traci.simulationStep()
+                step += 1
+                timer.mark('traci_step')
+                if gui:
+                    gui.begin_step()
+    
+                subscribed_data = self.vehicle_subscription.results()
+                timer.mark('subscription')
+                vehicle_grid = self.calc.build_vehicle_grid(subscribed_data) # shared by all UAVs of this step
+                timer.mark('vehicle_grid')
+                fleet.advance(paths, step) # pose of every UAV at this step
+                reporting = fleet.active.copy() # UAVs with a row in the output
+    
+                if step == start_step + 1 and gui:
+                    # a resumed run draws the UAVs where they are, the saved SUMO state has no shapes
+                    poses = fleet.first_poses() if start_step == 0 else (fleet.positions, fleet.yaw_angles)
+                    for uav_id, (uav_position, yaw_angle) in enumerate(zip(*poses)):
+                        if not (battery and battery.depleted[uav_id]):
+                            gui.add(uav_id, uav_position, yaw_angle)
+                
+                if battery:
+                    # warning and depletion steps are scheduled when a path is published, only due events are handled here
+                    for uav_id, event in battery.advance(paths, step):
+                        uav_id = int(uav_id)
+                        if event == WARNING:
+                            self.events.publish(BATTERY_WARNING, step, step * self.simulation_step_length, f"Warning: UAV {uav_id} has 5 minutes of battery left.", uav_id=uav_id)
+                        else:
+                            if gui:
+                                gui.remove(uav_id)
+                            self.events.publish(SIGNAL_LOST, step, step * self.simulation_step_length, f"UAV {uav_id} lost signal.", uav_id=uav_id)
+                    reporting &= ~battery.depleted # a UAV that lost signal does not report for the rest of the run
+                timer.mark('uav_update')
+    
+                if gui:
+                    if self.UavMode == 'Sampling':
+                        # the FOV is only drawn while the UAV holds its pose
+                        for uav_id in np.flatnonzero(reporting & fleet.moved & gui.polygon_drawn):
+                            gui.remove_polygon(uav_id)
+                        for uav_id in np.flatnonzero(reporting & ~fleet.moved & ~gui.polygon_drawn):
+                            gui.add_polygon(uav_id, fleet.positions[uav_id], fleet.yaw_angles[uav_id])
+                    gui.update(reporting, fleet.positions, fleet.yaw_angles, fleet.moved) # skips the calls that would not change the drawing
+                    timer.mark('gui_update')
+    
+                # the FOVs of all detecting UAVs are checked together, in Sampling mode a moving UAV does not detect
+                detecting = reporting & ~fleet.moved if self.UavMode == 'Sampling' else reporting
+                fov_corners = self.calc.calculate_fleet_fov_corners(fleet.positions[detecting], self.fov_degrees, fleet.yaw_angles[detecting])
+                timer.mark('uav_update')
+                if self.lane_visibility:
+                    vehicles_in_fovs = self.lane_visibility.get_vehicles_in_fovs(vehicle_grid, self.lane_visibility.vehicle_lanes(subscribed_data), fov_corners)
+                else:
+                    vehicles_in_fovs = self.calc.get_vehicles_in_fovs(vehicle_grid, fov_corners)
+                timer.mark('fov_query')
+    
+                # REMOVE OR ADD FOR CONSECUTIVE UAV POSITIONS
+                if aggregates:
+                    aggregates.add(step, np.flatnonzero(reporting), np.flatnonzero(detecting), vehicles_in_fovs, vehicle_grid)
+                if tracks:
+                    tracks.add(step, np.flatnonzero(detecting), vehicles_in_fovs, vehicle_grid)
+                if reporting.any():
+                    uav_rows += int(reporting.sum())
+                    detection_rows += sum(len(in_view) for in_view in vehicles_in_fovs)
+                    if sink:
+                        fleet_in_view = [NO_VEHICLES] * self.num_UAVs
+                        for uav_id, in_view in zip(np.flatnonzero(detecting).tolist(), vehicles_in_fovs):
+                            fleet_in_view[uav_id] = in_view
+                        vehicles_in_view = [fleet_in_view[uav_id] for uav_id in np.flatnonzero(reporting).tolist()]
+                        sink.append(step_columns(step, step * self.simulation_step_length, fleet.uav_ids[reporting], fleet.positions[reporting], fleet.yaw_angles[reporting], vehicles_in_view, vehicle_grid))
+                timer.mark('output_write')
+                if checkpoint_steps and step % checkpoint_steps == 0:
+                    self.save_checkpoint(step, output_file, sink, tracks, event_sink, battery, uav_rows, detection_rows)
+                timer.end_step()
+    
+            if self.local_gui:
+                self.stop_flag = True
+                user_input_thread.join()
+                
+            if self.server_option:
+                self.stop_flag = True
+                server_thread.join()
+                
+            if event_sink:
+                self.events.unsubscribe(event_sink)
+        
+        self.close()
+        print("TraCI is closed")
+        summary = {'steps': step, 'uav_rows': uav_rows, 'detection_rows': detection_rows}
+        if self.profiling:
+            profiler.disable()
+            profiler.dump(self.profile_report, **summary, uavs=self.num_UAVs, wall_time_s=time.perf_counter() - t0)
+            print(f"Profile report written to {self.profile_report}")
+        return summary
+        
+
+    
+
+        
+    def save_checkpoint(self, step, output_file, sink, tracks, event_sink, battery, uav_rows, detection_rows):
+        # everything a new process needs to continue after `step`, the outputs are flushed up to here
+        with self.path_lock: # waypoints and paths as one consistent pair, server updates included
+            uav_data = copy.deepcopy(self.uav_data)
+            path_snapshot = self.path_snapshot
+        save_checkpoint(self.checkpoint_dir, self.traci, {
+            'config': self.config, 'step': step, 'output_file': output_file,
+            'uav_data': uav_data, 'path_snapshot': path_snapshot, 'battery': battery,
+            'raw_offset': sink.checkpoint() if sink else None, 'tracks': tracks.checkpoint() if tracks else None,
+            'events_offset': event_sink.checkpoint() if event_sink else None,
+            'uav_rows': uav_rows, 'detection_rows': detection_rows})
+        
+        
+    def restore(self, checkpoint):
+        # loads the SUMO state and the paths of a checkpoint, run_simulation continues after checkpoint['step']
+        self.traci.simulation.loadState(checkpoint['sumo_state'])
+        self.vehicle_subscription.restore()
+        with self.path_lock:
+            self.uav_data = checkpoint['uav_data']
+            self.path_snapshot = checkpoint['path_snapshot']
+        
+
+    def start_server(self):
+        # runs until stop_flag, see WaypointServer for the message format
+        WaypointServer(self, self.server_host, self.server_port, self.server_acks).run()
+
+    
+    def get_user_input(self):
+        from _local_gui import get_uav_position_input, show_error # Tkinter is only loaded by runs with a GUI
+        
+        while not self.stop_flag:
+            uav_id, position_str = get_uav_position_input()
+    
+            # Check if the break button was pressed
+            if uav_id.strip().lower() == 'break':
+                self.stop_flag = True
+                break
+    
+            try:
+                uav_id = int(uav_id.strip())
+                position = json.loads(position_str.strip())
+                if uav_id in range(self.num_UAVs):
+                    self.update_uav_path(uav_id, position)
+                else:
+                    show_error("Invalid Input", "The UAV ID is out of range.")
+            except ValueError:
+                show_error("Invalid Input", "Please enter a valid UAV ID and position format.")
+            except json.JSONDecodeError:
+                show_error("Invalid JSON Format", "Please ensure the position is in the correct JSON format.")
+
+
+
+    def update_uav_path(self, uav_id, details):
+        self.update_uav_waypoints(uav_id, [details])
+
+
+    def update_uav_waypoints(self, uav_id, waypoints):
+        # Inserts [time, x, y, z, yaw] waypoints of one UAV, the path is rebuilt once for all of them
+        self.update_fleet_waypoints([(uav_id, waypoints)])
+
+
+    def update_fleet_waypoints(self, fleet_waypoints):
+        # Inserts the waypoints of several UAVs, (uav_id, waypoints) pairs of lists or (N, 5) arrays, e.g. the views
+        # of a bulk upload, which are merged as arrays. All rebuilt paths are published as one snapshot, and the
+        # waypoints are only stored when every path of the batch was rebuilt.
+        fleet_waypoints = [(uav_id, np.asarray(waypoints, dtype=np.float64)) for uav_id, waypoints in fleet_waypoints]
+        end_time = self.total_simulation_steps * self.simulation_step_length
+        for uav_id, waypoints in fleet_waypoints:
+            if waypoints.ndim != 2 or waypoints.shape[1] != 5:
+                raise ValueError("Waypoints must be [time, x, y, z, yaw]")
+            if not np.isfinite(waypoints).all():
+                raise ValueError("Waypoints must be finite numbers")
+            if len(waypoints) and (waypoints[:, 0].min() < 0 or waypoints[:, 0].max() > end_time):
+                raise ValueError(f"Waypoint times must be between 0 and {end_time} s")
+        
+        with self.path_lock:
+            merged = {} # uav id -> new waypoints
+            rebuilt = {} # uav id -> new trajectory
+            for uav_id, waypoints in fleet_waypoints:
+                data_points = merged.get(uav_id, self.uav_data.get(str(uav_id)))
+                if data_points is None or len(waypoints) == 0:
+                    continue
+    
+                if self.local_gui:
+                    data_points = list(data_points) # the stored waypoints stay as they are if a rebuild fails
+                    first_index = min(self.insert_waypoint(data_points, waypoint) for waypoint in waypoints.tolist())
+                else:
+                    data_points, first_index = self.merge_waypoints(data_points, waypoints)
+                merged[uav_id] = data_points
+    
+                # Re-interpolate only the segments of this UAV from the earliest new waypoint on
+                rebuilt[uav_id] = self.trajectory.rebuild(rebuilt.get(uav_id, self.path_snapshot[uav_id]), data_points, first_index)
+    
+            # a new snapshot version is published with a single reference swap, the simulation loop never sees a
+            # half updated path or only some UAVs of a bulk upload
+            for uav_id, data_points in merged.items():
+                self.uav_data[str(uav_id)] = data_points
+            if rebuilt:
+                self.path_snapshot = self.path_snapshot.replace_many(rebuilt)
+
+
+    def merge_waypoints(self, data_points, waypoints):
+        # UAV data with the new waypoints inserted after the equal ones (as bisect.insort, keeps it sorted) and the
+        # index of the first new waypoint
+        merged = np.concatenate((np.asarray(data_points, dtype=np.float64).reshape(-1, 5), waypoints))
+        order = np.lexsort(merged.T[::-1]) # stable, by time, then x, y, z and yaw
+        first_index = int(np.argmax(order >= len(merged) - len(waypoints)))
+        return merged[order], first_index
+
+
+    def insert_waypoint(self, data_points, waypoint):
+        # Local GUI updates replace the next waypoint: here I ignore one waypoint after the new entry
+        
+        time = waypoint[0]
+    
+        # Find the index of the next waypoint to be executed
+        insert_index = next((idx for idx, point in enumerate(data_points) if point[0] > time), len(data_points))
+        
+        # Insert the new waypoint
+        data_points.insert(insert_index, waypoint)
+        
+        # Remove the next waypoint in the sequence
+        if len(data_points) > insert_index + 1:
+            data_points.pop(insert_index + 1)
+        
+        return insert_index
+
+
+    def uav_path_data(self):
+        return tuple(self.uav_path(uav_id) for uav_id in range(self.num_UAVs))
+
+
+    def close(self):
+        # closes the backend once, run_simulation and the callers cleaning up after a failed run both call it
+        if self.traci_closed:
+            return
+        self.traci_closed = True
+        try:
+            self.traci.close()
+        except (self.traci_error, self.fatal_error):
+            print("TraCI was already closed.")
+
+    def uav_path(self, uav_id):
+        # Trajectory with positions (N, 3), step times (N,) and yaw angles (N,) as contiguous arrays
+        return self.trajectory.build(self.uav_data[str(uav_id)])
+
+    
+        
+def start_simulation_thread(sim, tk_root=None, checkpoint=None):
+    try:
+        sim.start_sumo()
+        sim.run_simulation(checkpoint=checkpoint)
+    except sim.fatal_error:
+        print("Simulation terminated due to SUMO closing.")
+    finally:
+        sim.close()
+        # Stop Tkinter main loop once simulation finishes
+        if tk_root is not None:
+            tk_root.quit()  # Stops the Tkinter loop
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run SUAVPy.")
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--resume', nargs='?', const='', default=None, metavar='DIRECTORY',
+                        help="continue from the last checkpoint (in the Checkpoint Directory of the config if not given)")
+    parser.add_argument('--headless', action='store_true', help="run without Tkinter and sumo-gui, warnings only go to the event sinks")
+    args = parser.parse_args()
+
+    checkpoint = None
+    if args.resume is not None:
+        checkpoint_dir = args.resume
+        if not checkpoint_dir:
+            with open(args.config, 'r') as file:
+                checkpoint_dir = json.load(file).get('Checkpoint Directory', 'Outputs/checkpoint')
+        checkpoint = load_checkpoint(checkpoint_dir)
+        print(f" Resuming after step {checkpoint['step']} from {checkpoint_dir}")
+
+    # Initialize the simulation, a resumed run uses the configuration of its checkpoint
+    config = checkpoint['config'] if checkpoint else args.config
+    if args.headless:
+        if not isinstance(config, dict):
+            with open(config, 'r') as file:
+                config = json.load(file)
+        config = dict(config, Headless=True)
+    sim = UAVSimulation(config)
+
+    if sim.headless:
+        # the simulation runs in the main thread, Tkinter is never imported
+        start_simulation_thread(sim, checkpoint=checkpoint)
+        print("Simulation closed.")
+    else:
+        from _local_gui import tk, WarningWindows
+
+        #Initialize Tkinter main window
+        root = tk.Tk()
+        root.withdraw()  # Hide the main window since we don't need it
+        sim.events.subscribe(WarningWindows(root)) # battery and signal warnings as windows
+
+        # Start the simulation in a separate thread so it doesn't block the Tkinter event loop
+        simulation_thread = threading.Thread(target=start_simulation_thread, args=(sim, root, checkpoint))
+        simulation_thread.start()
+
+        # Start the Tkinter event loop (this must run in the main thread)
+        root.mainloop()
+
+        # Wait for the simulation thread to finish
+        simulation_thread.join()
+
+        # Exit the program once everything is done
+        print("Simulation and UI closed.")
+
+#######
+#######
+#######
+
+# if __name__ == "__main__":
+    
+#     sim = UAVSimulation('config.json')
+    
+#     try:
+#          t0 = time.time()
+#          sim.start_sumo()
+#          sim.run_simulation()
+#          t1 = time.time()
+#          print(f"Elapsed time: {t1 - t0} seconds")
+#     except traci.exceptions.TraCIException:
+#          traci.close()
+#          print("TraCI is fully closed from exception")
+
+#######
+#######
+#######
+        
+
@@ -0,0 +1,129 @@
+"""
+Parameter sweep runner of SUAVPy
+"""
+
+import argparse
+import copy
+import csv
+import itertools
+import os
+import time
+import ujson as json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from _outputs import EXTENSIONS
+
+
+def expand_grid(grid):
+    """
+    Parameters:
+    grid (dict): Config key -> list of values, e.g. {"Number of UAVs": [3, 5], "Uav Mode": ["Hovering", "Spinning"]}.
+
+    Returns:
+    list: One dict of config overrides per combination (cartesian product).
+    """
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def apply_overrides(base_config, overrides):
+    config = copy.deepcopy(base_config)
+    for key, value in overrides.items():
+        if key == 'Altitude (m)':
+            # every airborne waypoint of every UAV flies at the swept altitude
+            for waypoints in config['uav_data'].values():
+                for waypoint in waypoints:
+                    if waypoint[3] > 0:
+                        waypoint[3] = value
+        else:
+            config[key] = value
+
+    # sweep runs are headless and not interactive
+    config['Headless'] = True # workers never import Tkinter
+    config['GUI Option'] = False
+    config['Local GUI'] = False
+    config['Remote Server'] = False
+    return config
+
+
+def run_one(run_id, config, output_file):
+    # Runs in a worker process, each worker owns its SUMO instance through a labelled TraCI connection (or libsumo)
+    from main_ import UAVSimulation
+
+    t0 = time.perf_counter()
+    sim = UAVSimulation(config)
+    try:
+        sim.start_sumo(label=f"sweep_{run_id}")
+        summary = sim.run_simulation(output_file)
+    finally:
+        sim.close() # a failed run must not leak its SUMO process and connection label, no-op after a finished run
+    summary['wall_time_s'] = time.perf_counter() - t0
+    return summary
+
+
+def run_sweep(base_config, grid, output_dir='Outputs/sweep', workers=None, base_seed=0):
+    """
+    Runs every combination of the grid in a process pool and writes `summary.csv` to `output_dir`.
+
+    Parameters:
+    base_config (dict): Loaded config.json, the grid values override its keys.
+    grid (dict): Config key -> list of values, 'Altitude (m)' sets the altitude of all airborne waypoints.
+    output_dir (str): One output file per run plus the summary table.
+    workers (int): Number of worker processes, all cores if None.
+    base_seed (int): Run i uses SUMO seed base_seed + i unless 'Seed' is part of the grid.
+
+    Returns:
+    list: One summary dict per run, in run order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    runs = expand_grid(grid)
+    rows = [None] * len(runs)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {}
+        for run_id, overrides in enumerate(runs):
+            config = apply_overrides(base_config, overrides)
+            if 'Seed' not in overrides: # a Seed of the base config would give every run the same one
+                config['Seed'] = base_seed + run_id
+            run_name = os.path.join(output_dir, f"run_{run_id:04d}")
+            output_file = run_name + EXTENSIONS[config.get('Output Format', 'csv')]
+            # the other files of a run are named after its output too, parallel runs must not share them
+            config['Profile Report'] = run_name + '_profile' + os.path.splitext(config.get('Profile Report', 'Outputs/profile.json'))[1]
+            if config.get('FCD Output'):
+                config['FCD Output'] = run_name + '_fcd.xml'
+            config['Checkpoint Directory'] = os.path.join(run_name, 'checkpoint')
+            if config.get('Event File'):
+                config['Event File'] = run_name + '_events.jsonl'
+            rows[run_id] = {'run': run_id, 'seed': config['Seed'], **overrides, 'output': output_file}
+            futures[executor.submit(run_one, run_id, config, output_file)] = run_id
+
+        for future in as_completed(futures):
+            run_id = futures[future]
+            try:
+                rows[run_id].update(future.result(), status='ok')
+            except Exception as e:
+                rows[run_id].update(status=f"failed: {e}")
+            print(f" Run {run_id} {rows[run_id]['status']}")
+
+    fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+    with open(os.path.join(output_dir, 'summary.csv'), mode='w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a parameter sweep of UAV simulations in parallel.")
+    parser.add_argument('--config', default='config.json', help="base configuration file")
+    parser.add_argument('--grid', required=True, help="JSON file with config key -> list of values")
+    parser.add_argument('--output-dir', default='Outputs/sweep')
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first run")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as file:
+        base_config = json.load(file)
+    with open(args.grid, 'r') as file:
+        grid = json.load(file)
+
+    run_sweep(base_config, grid, args.output_dir, args.workers, args.seed)